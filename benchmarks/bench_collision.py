@@ -0,0 +1,42 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from collision import build_collision
+from level_format import DEFAULT_PALETTE
+
+
+def typical_level(rows, cols=75, seed=0):
+    rng = np.random.default_rng(seed)
+    tiles = np.zeros((rows, cols), dtype=np.uint8)
+    tiles[:, :3] = 2
+    tiles[:, -3:] = 2
+    for top in range(0, rows, 12):
+        left = int(rng.integers(3, cols - 20))
+        tiles[top:top + 2, left:left + int(rng.integers(5, 18))] = 1
+    tiles[rng.random(tiles.shape) < 0.002] = 1
+    return tiles
+
+
+def main():
+    for rows in (1000, 100000, 1000000):
+        tiles = typical_level(rows)
+        start = time.perf_counter()
+        grid = build_collision(tiles, DEFAULT_PALETTE)
+        build = time.perf_counter() - start
+        solid = int(np.count_nonzero(tiles))
+        queries = 10000
+        start = time.perf_counter()
+        for i in range(queries):
+            grid.query_aabb(i % 70, i * 7919 % rows, 2, 3)
+        query = (time.perf_counter() - start) / queries
+        print(f"{rows:8d} rows: {solid:9d} solid tiles -> {len(grid.rects):8d} rects "
+              f"({solid / max(len(grid.rects), 1):5.1f}x), build {build * 1000:8.1f} ms, "
+              f"aabb query {query * 1e6:5.1f} us")
+
+
+if __name__ == '__main__':
+    main()
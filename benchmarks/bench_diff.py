@@ -0,0 +1,54 @@
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from level_diff import apply_patch, chunk_hashes, diff_levels, merge_levels
+from level_format import DEFAULT_PALETTE, Level, load_level, save_level
+
+
+def make_tiles(rows, cols, seed=0):
+    rng = np.random.default_rng(seed)
+    return ((rng.random((rows, cols)) < 0.2) * rng.integers(1, 3, (rows, cols))).astype(np.uint8)
+
+
+def edited(tiles, count, seed):
+    rng = np.random.default_rng(seed)
+    out = tiles.copy()
+    rows, cols = rng.integers(0, len(tiles), count), rng.integers(0, tiles.shape[1], count)
+    out[rows, cols] = (out[rows, cols] + 1) % 3
+    return out
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def main():
+    rows, cols = 1000000, 30
+    base = make_tiles(rows, cols)
+    ours, theirs = edited(base, 100, 1), edited(base, 100, 2)
+    with tempfile.TemporaryDirectory() as folder:
+        paths = []
+        for name, tiles in (('base', base), ('ours', ours), ('theirs', theirs)):
+            paths.append(os.path.join(folder, name + '.lvl'))
+            save_level(paths[-1], Level(tiles, DEFAULT_PALETTE, 20, 1500))
+        levels = [load_level(path) for path in paths]
+        hashing, _ = timed(lambda: chunk_hashes(levels[0].tiles))
+        naive, _ = timed(lambda: np.argwhere(np.asarray(levels[0].tiles) != np.asarray(levels[1].tiles)))
+        diffing, diffs = timed(lambda: diff_levels(levels[0], levels[1]))
+        patching, _ = timed(lambda: apply_patch(load_level(paths[0]), diffs))
+        merging, (_, conflicts) = timed(lambda: merge_levels(*levels))
+    print(f"rows={rows}  chunk hashes {hashing:7.1f} ms  cell compare {naive:7.1f} ms  "
+          f"diff {diffing:7.1f} ms ({sum(len(diff.rows) for diff in diffs)} cells)")
+    print(f"apply patch {patching:7.1f} ms  merge {merging:7.1f} ms "
+          f"({sum(len(layer.rows) for layer in conflicts)} conflicts)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+import os
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame as pg
+from editor_helpers import paint_at
+from grid_renderer import draw_tile
+from tile_editor2 import TileEditor
+
+
+def make_editor(grid):
+    editor = TileEditor()
+    editor.dialog_box.texts[0].answer = str(grid)
+    editor.end_box()
+    editor.selected_type = 1
+    editor.draw()
+    return editor
+
+
+def legacy_draw(editor):
+    editor.screen.fill((200, 200, 200))
+    first, last = editor.camera.visible_rows(editor.square_side)
+    for row, line in enumerate(editor.tile_map.get_rows(first, last), first):
+        for col, type_num in enumerate(line):
+            rect = pg.Rect(col * editor.square_side, editor.camera.to_screen_y(row * editor.square_side),
+                           editor.square_side, editor.square_side)
+            draw_tile(editor.screen, rect, editor.tile_map.color(type_num))
+    editor.draw_tile_menu()
+    pg.display.flip()
+
+
+def frame_time(editor, frames, before_frame=None, draw=None):
+    draw = draw or editor.draw
+    start = time.perf_counter()
+    for frame in range(frames):
+        if before_frame is not None:
+            before_frame(frame)
+        draw()
+    return (time.perf_counter() - start) / frames * 1000
+
+
+def main():
+    pg.init()
+    for grid in (20, 50, 100):
+        editor = make_editor(grid)
+        legacy = frame_time(editor, 50, draw=lambda: legacy_draw(editor))
+        idle = frame_time(editor, 500)
+        stroke = frame_time(editor, 500, lambda frame: paint_at(
+            editor, ((frame * 7) % editor.width, (frame * 3) % int(editor.camera.view_height))))
+        scroll = frame_time(editor, 200, lambda frame: editor.camera.move(editor.square_side / 5))
+        print(f"grid={grid:4d}  full redraw={legacy:8.3f} ms  idle={idle:8.3f} ms  "
+              f"paint={stroke:8.3f} ms  scroll={scroll:8.3f} ms")
+    pg.quit()
+
+
+if __name__ == '__main__':
+    main()
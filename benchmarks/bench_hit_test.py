@@ -0,0 +1,67 @@
+import os
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame as pg
+from tile_editor2 import TileEditor
+
+
+class LegacyGrid:
+
+    def __init__(self, rows, cols, side):
+        self.tiles = [[[pg.Rect(i * side, j * side, side, side), 0] for i in range(cols)] for j in range(rows)]
+
+    def handle_mouse_motion(self, event):
+        for line in self.tiles:
+            for tile in line:
+                if tile[0].collidepoint(event.pos):
+                    tile[1] = 1
+
+
+def make_editor(rows):
+    editor = TileEditor()
+    editor.dialog_box.texts[0].answer = "20"
+    editor.end_box()
+    editor.tile_map.add_rows(rows - editor.tile_map.rows)
+    editor.clicked = True
+    editor.selected_type = 1
+    return editor
+
+
+def paint_event(editor):
+    def handle(event):
+        editor.stroke.end()
+        editor.handle_mouse_motion(event)
+        editor.apply_stroke()
+    return handle
+
+
+def make_events(count, width, height):
+    return [pg.event.Event(pg.MOUSEMOTION, pos=((i * 37) % width, (i * 53) % height), rel=(0, 0), buttons=(1, 0, 0))
+            for i in range(count)]
+
+
+def events_per_second(handler, events):
+    start = time.perf_counter()
+    for event in events:
+        handler(event)
+    return len(events) / (time.perf_counter() - start)
+
+
+def main():
+    pg.init()
+    for rows in (20, 100, 500):
+        editor = make_editor(rows)
+        events = make_events(2000, editor.width, editor.height - int(editor.square_side))
+        legacy = LegacyGrid(rows, editor.tile_map.cols, editor.square_side)
+        before = events_per_second(legacy.handle_mouse_motion, events[:max(20, 4000 // rows)])
+        after = events_per_second(paint_event(editor), events)
+        print(f"rows={rows:4d}  before={before:12.0f} ev/s  after={after:12.0f} ev/s  speedup={after / before:8.1f}x")
+    pg.quit()
+
+
+if __name__ == '__main__':
+    main()
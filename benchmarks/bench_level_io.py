@@ -0,0 +1,51 @@
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from level_format import Level, load_level, save_level
+
+PALETTE = [[(200, 200, 200), (150, 150, 150)], [(255, 0, 0), (180, 0, 0)], [(0, 0, 255), (0, 0, 180)]]
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def write_legacy(path, tiles):
+    with open(path, 'w') as file:
+        for line in tiles:
+            file.write(''.join(map(str, line)))
+            file.write('\n')
+
+
+def main():
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as folder:
+        for rows in (100000, 1000000):
+            tiles = (rng.random((rows, 30)) < 0.1).astype(np.uint8) * rng.integers(1, 3, (rows, 30), dtype=np.uint8)
+            level = Level(tiles, PALETTE, 20, 1500)
+            raw, compressed, legacy = (os.path.join(folder, name) for name in ('raw.lvl', 'zip.lvl', 'legacy.txt'))
+            _, save_raw = timed(lambda: save_level(raw, level))
+            _, save_zip = timed(lambda: save_level(compressed, level, compress=True))
+            loaded, load_raw = timed(lambda: load_level(raw).tiles)
+            unzipped, load_zip = timed(lambda: load_level(compressed).tiles)
+            assert np.array_equal(loaded, tiles) and np.array_equal(unzipped, tiles)
+            print(f"rows={rows:8d}  save raw={save_raw:8.1f} ms  save zlib={save_zip:8.1f} ms  "
+                  f"load mmap={load_raw:6.2f} ms  load zlib={load_zip:8.1f} ms  "
+                  f"size raw={os.path.getsize(raw) >> 10} KiB zlib={os.path.getsize(compressed) >> 10} KiB")
+            if rows <= 100000:
+                _, save_txt = timed(lambda: write_legacy(legacy, tiles))
+                imported, load_txt = timed(lambda: load_level(legacy, PALETTE))
+                assert np.array_equal(imported.tiles, tiles)
+                print(f"              legacy txt save={save_txt:8.1f} ms  import={load_txt:8.1f} ms")
+            del loaded
+
+
+if __name__ == '__main__':
+    main()
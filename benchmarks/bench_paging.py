@@ -0,0 +1,35 @@
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from tile_map import TileMap
+
+PALETTE = [[(200, 200, 200), (150, 150, 150)], [(255, 0, 0), (180, 0, 0)], [(0, 0, 255), (0, 0, 180)]]
+
+
+def peak_rss_mib():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    rng = np.random.default_rng(0)
+    for total_rows in (100000, 1000000, 4000000):
+        tile_map = TileMap(30, PALETTE, memory_budget=8 * 1024 * 1024)
+        start = time.perf_counter()
+        window = 19
+        for top in range(0, total_rows, 1000):
+            tile_map.add_rows(max(0, top + window - tile_map.rows))
+            tile_map.get_rows(top, top + window)
+            rows = top + rng.integers(0, window, 20)
+            tile_map.set_cells(rows, rng.integers(0, 30, 20), 1)
+        elapsed = time.perf_counter() - start
+        print(f"rows={total_rows:8d}  resident={tile_map.resident_bytes() / 2 ** 20:6.2f} MiB  "
+              f"paged chunks={len(tile_map.paged):6d}  peak rss={peak_rss_mib():7.1f} MiB  time={elapsed:6.2f} s")
+
+
+if __name__ == '__main__':
+    main()
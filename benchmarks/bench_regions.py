@@ -0,0 +1,66 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from history import CellDelta, RunDelta
+from regions import flood_fill_chunks, flood_fill_runs, rect_runs, runs_to_mask
+from tile_map import TileMap
+
+PALETTE = [[(200, 200, 200), (150, 150, 150)], [(255, 0, 0), (180, 0, 0)], [(0, 0, 255), (0, 0, 180)]]
+
+
+def best_of(func, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return min(times)
+
+
+def main():
+    rng = np.random.default_rng(0)
+    tiles = np.zeros((1000, 1000), dtype=np.uint8)
+    tiles[::50, 10:] = 1
+    tiles[25::50, :990] = 1
+    cases = {'open 1000x1000': np.zeros((1000, 1000), dtype=np.uint8), 'maze 1000x1000': tiles,
+             'noise 1000x1000': (rng.random((1000, 1000)) < 0.3).astype(np.uint8)}
+    for name, array in cases.items():
+        for connectivity in (4, 8):
+            tile_map = TileMap.from_array(array.copy(), PALETTE)
+
+            def fill():
+                runs = flood_fill_runs(tile_map.to_array(), 1, 0, connectivity)
+                RunDelta(*runs, 0, 2).apply(tile_map, undo=False)
+                return runs
+
+            runs = fill()
+            cells = int((runs[2] - runs[1]).sum())
+            elapsed = best_of(lambda: RunDelta(*flood_fill_runs(array, 1, 0, connectivity), 0, 2).apply(
+                TileMap.from_array(array.copy(), PALETTE), undo=False))
+            print(f"{name:16s} {connectivity}-connected  cells={cells:8d}  fill={elapsed:7.2f} ms")
+    paged = TileMap(30, PALETTE, rows=2000000)
+    paged.set_cells(rng.integers(0, 5000, 20000), rng.integers(0, 30, 20000), 1)
+
+    def fill_paged(type_num):
+        runs = flood_fill_chunks(paged, 100000, 0)
+        RunDelta(*runs[:3], paged.get(100000, 0), type_num, runs[3], paged.cols).apply(paged, undo=False)
+
+    elapsed = best_of(lambda: (fill_paged(2), fill_paged(0)), repeat=3) / 2
+    print(f"paged fill 2000000x30 = {elapsed:7.2f} ms  resident={paged.resident_bytes() // 2 ** 20} MiB")
+    tile_map = TileMap.from_array(cases['noise 1000x1000'].copy(), PALETTE)
+
+    def fill_rect(type_num):
+        top, mask = runs_to_mask(*rect_runs((0, 0), (999, 999), (1000, 1000)), 1000)
+        delta, changed = CellDelta.capture_mask(tile_map, top, mask, type_num)
+        tile_map.fill_mask(top, changed, type_num)
+
+    elapsed = best_of(lambda: (fill_rect(2), fill_rect(0)), repeat=3) / 2
+    print(f"rectangle fill 1000x1000 = {elapsed:7.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+import os
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame as pg
+from tile_editor2 import TileEditor
+
+
+def make_editor(rows):
+    editor = TileEditor()
+    editor.dialog_box.texts[0].answer = "20"
+    editor.end_box()
+    editor.tile_map.add_rows(rows - editor.tile_map.rows)
+    return editor
+
+
+def scrolls_per_second(editor, steps):
+    editor.scrolling_down = True
+    start = time.perf_counter()
+    for _ in range(steps):
+        editor.scroll_screen()
+    return steps / (time.perf_counter() - start)
+
+
+def main():
+    pg.init()
+    for rows in (20, 10000):
+        editor = make_editor(rows)
+        print(f"rows={rows:6d}  {scrolls_per_second(editor, 20000):12.0f} scroll steps/s")
+    pg.quit()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+import os
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pygame as pg
+from level_format import LevelLayer
+from mipmap import MipPyramid
+from tile_editor2 import TileEditor
+
+
+def make_editor(rows):
+    editor = TileEditor(autosave_interval=0)
+    editor.dialog_box.texts[0].answer = "20"
+    editor.end_box()
+    rng = np.random.default_rng(0)
+    tiles = (rng.random((rows, 30)) < 0.2) * rng.integers(1, 3, (rows, 30))
+    editor.setup_grid([LevelLayer('base', tiles.astype(np.uint8))])
+    return editor
+
+
+def timed(function):
+    start = time.perf_counter()
+    function()
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    pg.init()
+    for rows in (10000, 100000):
+        editor = make_editor(rows)
+        pyramid = editor.pyramid
+        levels = editor.max_zoom()
+        build = timed(lambda: pyramid.image(levels, 0, 1))
+        editor.zoom = min(levels, 4)
+        frames = 200
+        start = time.perf_counter()
+        for step in range(frames):
+            editor.camera.jump_to(step * 40 * editor.square_side)
+            editor.draw()
+        frame = (time.perf_counter() - start) * 1000 / frames
+        editor.selected_type = 1
+        editor.fill_rect((100, 0), (140, 20), 1)
+        update = timed(lambda: pyramid.image(levels, 0, 1))
+        reference = MipPyramid(editor.layers, editor.tile_map.palette)
+        same = all(np.array_equal(pyramid.image(level, 0, -(-rows // 2 ** level)),
+                                  reference.image(level, 0, -(-rows // 2 ** level))) for level in range(1, levels + 1))
+        print(f"rows={rows:6d}  build {build:8.1f} ms  zoomed frame {frame:6.2f} ms  "
+              f"edit update {update:6.2f} ms  matches rebuild {same}")
+    pg.quit()
+
+
+if __name__ == '__main__':
+    main()
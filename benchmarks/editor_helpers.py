@@ -0,0 +1,4 @@
+def paint_at(editor, pos):
+    editor.stroke.end()
+    editor.stroke.add(editor.cell_at(pos))
+    editor.commit_stroke()
@@ -0,0 +1,208 @@
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pygame as pg
+from dialog_box import DialogBox
+from editor_helpers import paint_at
+from level_format import Level, LevelLayer, load_level, save_level
+from tile_editor2 import TileEditor
+
+GRIDS = (20, 50, 100)
+LEVEL_ROWS = (1000, 100000, 1000000)
+
+
+def best_time(func, repeat=5, number=1):
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            times.append((time.perf_counter() - start) / number)
+        finally:
+            gc.enable()
+    return min(times)
+
+
+def type_into(dialog_box, index, text):
+    field = dialog_box.texts[index]
+    dialog_box.handle_text_box_mouse(pg.event.Event(pg.MOUSEBUTTONDOWN, pos=field.rect.center, button=1))
+    for char in text:
+        dialog_box.handle_text_box_text(pg.event.Event(pg.KEYDOWN, key=ord(char), unicode=char, mod=0))
+
+
+def make_editor(grid):
+    editor = TileEditor(autosave_interval=0)
+    type_into(editor.dialog_box, 0, str(grid))
+    editor.end_box()
+    editor.draw()
+    return editor
+
+
+def motion_events(editor, count):
+    height = int(editor.camera.view_height)
+    return [pg.event.Event(pg.MOUSEMOTION, pos=((i * 37) % editor.width, (i * 53) % height),
+                           rel=(0, 0), buttons=(1, 0, 0)) for i in range(count)]
+
+
+def bench_startup(results):
+    for grid in GRIDS:
+        editor = make_editor(grid)
+        seconds = best_time(editor.end_box, number=200)
+        record(results, f'startup.end_box.grid{grid}', seconds * 1000, 'ms', 'lower')
+        editor.saver.close()
+
+
+def bench_scroll(results):
+    for rows in LEVEL_ROWS:
+        editor = make_editor(20)
+        editor.tile_map.add_rows(rows - editor.tile_map.rows)
+        editor.scrolling_down = True
+        steps = 20000
+        seconds = best_time(lambda: [editor.scroll_screen() for _ in range(steps)], repeat=3)
+        record(results, f'scroll.steps_per_sec.rows{rows}', steps / seconds, 'steps/s', 'higher')
+        editor.saver.close()
+
+
+def bench_paint(results):
+    for grid in GRIDS:
+        editor = make_editor(grid)
+        editor.selected_type = 1
+        events = motion_events(editor, 2000)
+
+        def drag():
+            editor.handle_mouse_click(pg.event.Event(pg.MOUSEBUTTONDOWN, pos=events[0].pos, button=1))
+            for start in range(0, len(events), 8):
+                for event in events[start:start + 8]:
+                    editor.handle_mouse_motion(event)
+                editor.apply_stroke()
+            editor.handle_mouse_up(pg.event.Event(pg.MOUSEBUTTONUP, pos=events[-1].pos, button=1))
+
+        seconds = best_time(drag, repeat=3)
+        record(results, f'paint.events_per_sec.grid{grid}', len(events) / seconds, 'events/s', 'higher')
+        editor.saver.close()
+
+
+def bench_frame(results):
+    for grid in GRIDS:
+        editor = make_editor(grid)
+        frames = 200
+        idle = best_time(lambda: [editor.draw() for _ in range(frames)], repeat=3) / frames
+        record(results, f'frame.idle.grid{grid}', idle * 1000, 'ms', 'lower')
+
+        def paint_frames():
+            for frame in range(frames):
+                editor.selected_type = 1 + frame % 2
+                paint_at(editor, ((frame * 7) % editor.width, (frame * 3) % int(editor.camera.view_height)))
+                editor.draw()
+
+        record(results, f'frame.paint.grid{grid}', best_time(paint_frames, repeat=3) / frames * 1000, 'ms', 'lower')
+
+        def scroll_frames():
+            for _ in range(frames):
+                editor.camera.move(editor.square_side / 5)
+                editor.draw()
+
+        record(results, f'frame.scroll.grid{grid}', best_time(scroll_frames, repeat=3) / frames * 1000, 'ms',
+               'lower')
+        editor.saver.close()
+
+
+def bench_save_load(results):
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'level.lvl')
+        for rows in LEVEL_ROWS:
+            editor = make_editor(20)
+            tiles = (rng.random((rows, editor.tile_map.cols)) < 0.1).astype(np.uint8)
+            editor.setup_grid([LevelLayer('base', tiles)])
+            snapshot = best_time(lambda: editor.tile_map.snapshot().release())
+            record(results, f'save.snapshot.rows{rows}', snapshot * 1000, 'ms', 'lower')
+            save = best_time(lambda: save_level(path, Level(editor.tile_map, editor.types, 20, editor.width)),
+                               repeat=3)
+            record(results, f'save.write.rows{rows}', save * 1000, 'ms', 'lower')
+            load = best_time(lambda: editor.load_from_file(path), repeat=3)
+            record(results, f'load.editor.rows{rows}', load * 1000, 'ms', 'lower')
+            assert np.array_equal(load_level(path).tiles, tiles)
+            editor.saver.close()
+
+
+def bench_dialog(results):
+    screen = pg.display.get_surface()
+    dialog_box = DialogBox(screen.get_width(), screen.get_height(), "title 1", "title 2", "title 3")
+    dialog_box.draw_text_box(screen)
+
+    def typing():
+        for index in range(len(dialog_box.texts)):
+            type_into(dialog_box, index, "12345")
+            dialog_box.draw_text_box(screen)
+
+    record(results, 'dialog.typing', best_time(typing, number=20) * 1000, 'ms', 'lower')
+
+
+def record(results, name, value, unit, better):
+    results[name] = {'value': value, 'unit': unit, 'better': better}
+    print(f"{name:40s} {value:14.3f} {unit}")
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        old, new = baseline[name]['value'], result['value']
+        if result['better'] == 'lower':
+            regressed = new > old * (1 + threshold)
+        else:
+            regressed = new < old * (1 - threshold)
+        change = (new - old) / old * 100 if old else 0.0
+        print(f"{'REGRESSION' if regressed else 'ok':10s} {name:40s} {old:14.3f} -> {new:14.3f} ({change:+.1f}%)")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+BENCHMARKS = {'startup': bench_startup, 'scroll': bench_scroll, 'paint': bench_paint, 'frame': bench_frame,
+              'save_load': bench_save_load, 'dialog': bench_dialog}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless benchmarks for the tile editor hot paths")
+    parser.add_argument('--only', nargs='*', choices=sorted(BENCHMARKS), help="run only these benchmarks")
+    parser.add_argument('--output', help="write results as JSON to this file")
+    parser.add_argument('--compare', help="baseline JSON file to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2, help="allowed relative slowdown (default 0.2)")
+    args = parser.parse_args()
+
+    pg.init()
+    pg.display.set_mode((1500, 1000))
+    results = {}
+    for name in args.only or BENCHMARKS:
+        BENCHMARKS[name](results)
+    pg.quit()
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'python': sys.version.split()[0], 'numpy': np.__version__, 'pygame': pg.version.ver,
+                       'results': results}, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(results, json.load(file)['results'], args.threshold)
+        if regressions:
+            print(str(len(regressions)) + " regression(s) over " + format(args.threshold, '.0%'))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+import math
+
+
+class Camera:
+
+    def __init__(self, view_width, view_height, y=0.0):
+        self.view_width = view_width
+        self.view_height = view_height
+        self.y = y
+
+    def move(self, dy):
+        self.y = max(0.0, self.y + dy)
+
+    def jump_to(self, y):
+        self.y = max(0.0, y)
+
+    def visible_rows(self, side):
+        first = int(self.y // side)
+        last = int(math.ceil((self.y + self.view_height) / side))
+        return first, last
+
+    def to_screen_y(self, world_y):
+        return world_y - self.y
+
+    def to_world(self, pos):
+        return pos[0], pos[1] + self.y
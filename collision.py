@@ -0,0 +1,162 @@
+import os
+import struct
+
+import numpy as np
+
+from level_format import iter_blocks, tiles_shape
+
+COLLISION_MAGIC = b'TLCL'
+COLLISION_VERSION = 1
+COLLISION_HEADER = struct.Struct('<4sHIIQQ')
+
+
+def collision_path(path):
+    return os.path.splitext(path)[0] + '.col'
+
+
+def type_runs(tiles, solid):
+    values = np.zeros((tiles.shape[0], tiles.shape[1] + 1), dtype=np.int32)
+    values[:, :-1] = np.where(np.isin(tiles, solid), tiles.astype(np.int32) + 1, 0)
+    flat = values.ravel()
+    changes = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    if flat.size and flat[0]:
+        changes = np.concatenate([[0], changes])
+    keep = flat[changes[:-1]] != 0
+    starts, ends = changes[:-1][keep], changes[1:][keep]
+    run_rows, starts = np.divmod(starts, values.shape[1])
+    return run_rows, starts, ends - run_rows * values.shape[1], flat[changes[:-1][keep]] - 1
+
+
+def greedy_mesh(tiles, solid, block_rows=65536):
+    all_runs, offset = [], 0
+    for block in iter_blocks(tiles, block_rows):
+        run_rows, starts, ends, types = type_runs(block, solid)
+        all_runs.append((run_rows + offset, starts, ends, types))
+        offset += len(block)
+    if not all_runs:
+        return np.zeros((0, 5), dtype=np.int64)
+    run_rows, starts, ends, types = (np.concatenate(part) for part in zip(*all_runs))
+    order = np.lexsort((run_rows, types, ends, starts))
+    run_rows, starts, ends, types = run_rows[order], starts[order], ends[order], types[order]
+    head = np.ones(run_rows.size, dtype=bool)
+    head[1:] = (starts[1:] != starts[:-1]) | (ends[1:] != ends[:-1]) | (types[1:] != types[:-1]) | \
+        (run_rows[1:] != run_rows[:-1] + 1)
+    heights = np.bincount(np.cumsum(head) - 1)
+    rects = np.stack([starts[head], run_rows[head], ends[head] - starts[head], heights, types[head]], axis=1)
+    return rects[np.lexsort((rects[:, 0], rects[:, 1]))].astype(np.int64)
+
+
+class SpatialGrid:
+
+    def __init__(self, rects, cols, rows, cell_size=16):
+        self.rects = rects
+        self.cols = cols
+        self.rows = rows
+        self.cell_size = cell_size
+        self.grid_cols = max(-(-cols // cell_size), 1)
+        self.grid_rows = max(-(-rows // cell_size), 1)
+        first_x, first_y = rects[:, 0] // cell_size, rects[:, 1] // cell_size
+        last_x = (rects[:, 0] + rects[:, 2] - 1) // cell_size
+        last_y = (rects[:, 1] + rects[:, 3] - 1) // cell_size
+        span_x, span_y = last_x - first_x + 1, last_y - first_y + 1
+        counts = span_x * span_y
+        owner = np.repeat(np.arange(len(rects)), counts)
+        local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        cells = (first_y[owner] + local // span_x[owner]) * self.grid_cols + first_x[owner] + local % span_x[owner]
+        order = np.argsort(cells, kind='stable')
+        self.items = owner[order].astype(np.uint32)
+        self.offsets = np.searchsorted(cells[order], np.arange(self.grid_cols * self.grid_rows + 1))
+
+    @classmethod
+    def from_arrays(cls, rects, cols, rows, cell_size, offsets, items):
+        grid = cls.__new__(cls)
+        grid.rects, grid.cols, grid.rows, grid.cell_size = rects, cols, rows, cell_size
+        grid.grid_cols = max(-(-cols // cell_size), 1)
+        grid.grid_rows = max(-(-rows // cell_size), 1)
+        grid.offsets, grid.items = offsets, items
+        return grid
+
+    def cell_items(self, cell_x, cell_y):
+        cell = cell_y * self.grid_cols + cell_x
+        return self.items[self.offsets[cell]:self.offsets[cell + 1]]
+
+    def query_point(self, x, y):
+        cell_x, cell_y = int(x // self.cell_size), int(y // self.cell_size)
+        if not (0 <= cell_x < self.grid_cols and 0 <= cell_y < self.grid_rows):
+            return np.empty(0, dtype=np.uint32)
+        found = self.cell_items(cell_x, cell_y)
+        rects = self.rects[found]
+        inside = (rects[:, 0] <= x) & (x < rects[:, 0] + rects[:, 2]) & \
+            (rects[:, 1] <= y) & (y < rects[:, 1] + rects[:, 3])
+        return found[inside]
+
+    def query_aabb(self, x, y, width, height):
+        first_x, first_y = max(int(x // self.cell_size), 0), max(int(y // self.cell_size), 0)
+        last_x = min(int((x + width) // self.cell_size), self.grid_cols - 1)
+        last_y = min(int((y + height) // self.cell_size), self.grid_rows - 1)
+        if first_x > last_x or first_y > last_y:
+            return np.empty(0, dtype=np.uint32)
+        found = np.unique(np.concatenate([self.cell_items(cell_x, cell_y) for cell_y in range(first_y, last_y + 1)
+                                          for cell_x in range(first_x, last_x + 1)]))
+        rects = self.rects[found]
+        overlap = (rects[:, 0] < x + width) & (x < rects[:, 0] + rects[:, 2]) & \
+            (rects[:, 1] < y + height) & (y < rects[:, 1] + rects[:, 3])
+        return found[overlap]
+
+
+def solid_types(palette):
+    return list(range(1, len(palette)))
+
+
+def parse_solid(text):
+    solid = []
+    for part in text.split(','):
+        first, _, last = part.strip().partition('-')
+        if not first.isdigit() or (last and not last.isdigit()):
+            raise ValueError("solid types must look like 1,3-5, got " + repr(text))
+        solid.extend(range(int(first), int(last or first) + 1))
+    return sorted(set(solid))
+
+
+def collision_tiles(level):
+    for layer in level.layers:
+        if layer.name == 'collision':
+            return layer.tiles
+    return level.tiles
+
+
+def build_collision(tiles, palette, solid=None, cell_size=16):
+    rows, cols = tiles_shape(tiles)
+    rects = greedy_mesh(tiles, solid_types(palette) if solid is None else solid)
+    return SpatialGrid(rects, cols, rows, cell_size)
+
+
+def save_collision(path, grid):
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as file:
+        file.write(COLLISION_HEADER.pack(COLLISION_MAGIC, COLLISION_VERSION, grid.cell_size, grid.cols, grid.rows,
+                                         len(grid.rects)))
+        file.write(np.ascontiguousarray(grid.rects, dtype=np.uint32).tobytes())
+        file.write(np.ascontiguousarray(grid.offsets, dtype=np.uint64).tobytes())
+        file.write(np.ascontiguousarray(grid.items, dtype=np.uint32).tobytes())
+    os.replace(temp_path, path)
+
+
+def load_collision(path):
+    with open(path, 'rb') as file:
+        data = file.read()
+    if len(data) < COLLISION_HEADER.size:
+        raise ValueError("truncated collision header")
+    magic, version, cell_size, cols, rows, count = COLLISION_HEADER.unpack_from(data)
+    if magic != COLLISION_MAGIC:
+        raise ValueError("not a collision file")
+    if version != COLLISION_VERSION:
+        raise ValueError("unsupported collision version " + str(version))
+    offset = COLLISION_HEADER.size
+    rects = np.frombuffer(data, dtype=np.uint32, count=count * 5, offset=offset).reshape(count, 5).astype(np.int64)
+    offset += rects.size * 4
+    cells = max(-(-cols // cell_size), 1) * max(-(-rows // cell_size), 1)
+    offsets = np.frombuffer(data, dtype=np.uint64, count=cells + 1, offset=offset).astype(np.int64)
+    offset += offsets.size * 8
+    items = np.frombuffer(data, dtype=np.uint32, count=int(offsets[-1]), offset=offset)
+    return SpatialGrid.from_arrays(rects, cols, rows, cell_size, offsets, items)
@@ -12,6 +12,17 @@ class Text:
         self.rect_color = pg.Color('gray15')
         self.rect = pg.Rect(x, y, 140, 32)
         self.activated = False
+        self.title_surface = None
+        self.answer_surface = None
+        self.rendered_answer = None
+
+    def render(self, font):
+        if self.title_surface is None:
+            self.title_surface = font.render(self.title + ':', True, self.text_color)
+        if self.answer != self.rendered_answer:
+            self.answer_surface = font.render(self.answer, True, (255, 255, 255))
+            self.rendered_answer = self.answer
+            self.rect.width = max(self.answer_surface.get_width(), 140)
 
 
 class DialogBox:
@@ -21,6 +32,7 @@ class DialogBox:
         self.x, self.y = screen_width/2-self.text_box.get_width()/2, screen_height/2-self.text_box.get_height()/2
         self.font = pg.font.SysFont('Arial', 32)
         self.texts = []
+        self.drawn_rect = None
         for idx, arg in enumerate(argv, 1):
             y_pos = self.y-16+idx*self.text_box.get_height()/(len(argv)+1) if len(argv) < 4 \
                 else self.y-32+1.2*idx*self.text_box.get_height()/(len(argv)+1)
@@ -29,19 +41,27 @@ class DialogBox:
                                    y_pos))
 
     def run(self, screen, func=None, arg=None):
+        screen.fill((200, 200, 200))
+        self.drawn_rect = None
+        self.draw_text_box(screen)
+        pg.display.flip()
         while True:
-            for event in pg.event.get():
+            redraw = False
+            for event in [pg.event.wait()] + pg.event.get():
                 if event.type == pg.QUIT:
                     return
                 elif event.type == pg.MOUSEBUTTONDOWN:
                     self.handle_text_box_mouse(event)
+                    redraw = True
                 elif event.type == pg.KEYDOWN:
                     if self.handle_text_box_return(event):
                         if func is not None:
                             return func(arg)
                         return
                     self.handle_text_box_text(event)
-            self.draw_text_box(screen)
+                    redraw = True
+            if redraw:
+                pg.display.update(self.draw_text_box(screen))
 
     def get_answers(self, var_types):
         answers = []
@@ -84,17 +104,27 @@ class DialogBox:
             return True
         return False
 
+    def get_rect(self):
+        rect = pg.Rect((self.x, self.y), self.text_box.get_size())
+        for text in self.texts:
+            rect.union_ip(text.rect)
+            rect.union_ip(text.title_surface.get_rect(topleft=(text.x-50, text.y-34)))
+        return rect
+
     def draw_text_box(self, screen):
-        screen.fill((200, 200, 200))
+        for text in self.texts:
+            text.render(self.font)
+        rect = self.get_rect()
+        dirty_rect = rect if self.drawn_rect is None else rect.union(self.drawn_rect)
+        screen.fill((200, 200, 200), dirty_rect)
         self.text_box.fill((20, 20, 20))
         screen.blit(self.text_box, (self.x, self.y))
-        for idx, text in enumerate(self.texts):
-            screen.blit(self.font.render(text.title+':', True, text.text_color), (text.x-50, text.y-34))
-            txt = self.font.render(text.answer, True, (255, 255, 255))
-            text.rect.width = max(txt.get_width(), 140)
+        for text in self.texts:
+            screen.blit(text.title_surface, (text.x-50, text.y-34))
             pg.draw.rect(screen, text.rect_color, text.rect, 2)
-            screen.blit(txt, (text.rect.x + 2, text.rect.y + 2))
-        pg.display.flip()
+            screen.blit(text.answer_surface, (text.rect.x + 2, text.rect.y + 2))
+        self.drawn_rect = rect
+        return dirty_rect
 
 
 if __name__ == '__main__':
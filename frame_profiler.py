@@ -0,0 +1,64 @@
+import csv
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class FrameProfiler:
+
+    def __init__(self, history=600):
+        self.frames = deque(maxlen=history)
+        self.current = {}
+        self.phases = []
+        self.frame_count = 0
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        if name not in self.phases:
+            self.phases.append(name)
+        self.current[name] = self.current.get(name, 0.0) + seconds * 1000
+
+    def end_frame(self, frame_ms):
+        self.current['frame'] = frame_ms
+        self.frames.append(self.current)
+        self.current = {}
+        self.frame_count += 1
+
+    def averages(self):
+        names = self.phases + ['frame']
+        if not self.frames:
+            return {name: 0.0 for name in names}
+        return {name: sum(frame.get(name, 0.0) for frame in self.frames) / len(self.frames) for name in names}
+
+    def export_csv(self, path):
+        names = self.phases + ['frame']
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(names)
+            for frame in self.frames:
+                writer.writerow([round(frame.get(name, 0.0), 4) for name in names])
+
+    def export_json(self, path):
+        with open(path, 'w') as file:
+            json.dump({'phases': self.phases + ['frame'], 'averages_ms': self.averages(),
+                       'frames': list(self.frames)}, file, indent=2)
+
+    def draw_overlay(self, screen, font, pos):
+        lines = [name + ": " + format(value, '.2f') + " ms" for name, value in self.averages().items()]
+        surfaces = [font.render(line, True, (255, 255, 255)) for line in lines]
+        width = max(surface.get_width() for surface in surfaces) + 10
+        height = sum(surface.get_height() for surface in surfaces) + 10
+        rect = screen.fill((20, 20, 20), (pos[0] - width, pos[1], width, height))
+        y = rect.y + 5
+        for surface in surfaces:
+            screen.blit(surface, (rect.x + 5, y))
+            y += surface.get_height()
+        return rect
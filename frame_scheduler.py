@@ -0,0 +1,54 @@
+import pygame as pg
+
+from frame_profiler import FrameProfiler
+
+
+class FrameScheduler:
+
+    def __init__(self, fps=60, update_rate=60, idle_fps=10, idle_after=1000, max_updates=5, profiler=None):
+        self.fps = fps
+        self.step = 1000 / update_rate
+        self.idle_fps = idle_fps
+        self.idle_after = idle_after
+        self.max_updates = max_updates
+        self.profiler = profiler or FrameProfiler()
+        self.clock = pg.time.Clock()
+        self.accumulator = 0.0
+        self.last_active = pg.time.get_ticks()
+        self.skipped_updates = 0
+
+    def idle(self):
+        return pg.time.get_ticks() - self.last_active >= self.idle_after
+
+    def tick(self):
+        frame_ms = self.clock.tick(self.idle_fps if self.idle() else self.fps)
+        self.accumulator += frame_ms
+        return frame_ms
+
+    def frame(self, handle_events, update, draw, is_busy=None):
+        frame_ms = self.tick()
+        was_idle = self.idle()
+        with self.profiler.phase(handle_events.__name__):
+            had_events = handle_events()
+        if had_events or (is_busy is not None and is_busy()):
+            self.last_active = pg.time.get_ticks()
+            if was_idle:
+                self.accumulator = min(self.accumulator, self.step)
+        updates = 0
+        with self.profiler.phase(update.__name__):
+            while self.accumulator >= self.step and updates < self.max_updates:
+                update()
+                self.accumulator -= self.step
+                updates += 1
+        if self.accumulator >= self.step:
+            self.skipped_updates += int(self.accumulator // self.step)
+            self.accumulator %= self.step
+        with self.profiler.phase(draw.__name__):
+            draw()
+        self.profiler.end_frame(frame_ms)
+
+    def run(self, is_running, handle_events, update, draw, is_busy=None):
+        self.clock.tick()
+        self.accumulator = 0.0
+        while is_running():
+            self.frame(handle_events, update, draw, is_busy)
@@ -0,0 +1,212 @@
+import math
+from collections import OrderedDict
+
+import numpy as np
+import pygame as pg
+
+TRANSPARENT = (255, 0, 255)
+
+
+def draw_tile(screen, rect, color, edge=2):
+    pg.draw.rect(screen, (0, 0, 0), rect)
+    pg.draw.rect(screen, color, (rect.x + edge, rect.y + edge, rect.width - 2 * edge, rect.height - 2 * edge))
+
+
+class GridRenderer:
+
+    def __init__(self, tile_map, atlas, side, width, view_height, chunk_rows=8, max_chunks=64, max_dirty_cells=4096,
+                 background=(200, 200, 200), transparent=False, opacity=255):
+        self.tile_map = tile_map
+        self.atlas = atlas
+        self.side = side
+        self.width = width
+        self.view_height = view_height
+        self.chunk_rows = chunk_rows
+        self.chunk_height = int(math.ceil(chunk_rows * side))
+        self.max_chunks = max_chunks
+        self.max_dirty_cells = max_dirty_cells
+        self.background = background
+        self.transparent = transparent
+        self.opacity = opacity
+        self.chunks = OrderedDict()
+        self.dirty_cells = set()
+        self.full_redraw = True
+        self.last_camera_y = None
+        tile_map.listeners.append(self.on_cells_changed)
+
+    def invalidate(self):
+        self.chunks.clear()
+        self.dirty_cells.clear()
+        self.full_redraw = True
+
+    def on_cells_changed(self, rows, cols):
+        if rows is None or rows.size > self.max_dirty_cells:
+            self.invalidate()
+            return
+        if cols is None:
+            for chunk in np.unique(rows // self.chunk_rows).tolist():
+                self.chunks.pop(chunk, None)
+            self.full_redraw = True
+            return
+        self.dirty_cells.update(zip(rows.tolist(), cols.tolist()))
+
+    def cell_rect(self, local_row, col):
+        return pg.Rect(col * self.side, local_row * self.side, self.side, self.side)
+
+    def chunk_y(self, chunk):
+        return int(chunk * self.chunk_rows * self.side)
+
+    def set_opacity(self, opacity):
+        self.opacity = opacity
+        for surface in self.chunks.values():
+            surface.set_alpha(None if opacity == 255 else opacity)
+
+    def render_chunk(self, chunk):
+        surface = pg.Surface((self.width, self.chunk_height))
+        if self.transparent:
+            surface.fill(TRANSPARENT)
+            surface.set_colorkey(TRANSPARENT)
+        else:
+            surface.fill(self.background)
+        if self.opacity != 255:
+            surface.set_alpha(self.opacity)
+        start = chunk * self.chunk_rows
+        lines = np.zeros((self.chunk_rows, self.tile_map.cols), dtype=self.tile_map.dtype)
+        stored = self.tile_map.get_rows(start, start + self.chunk_rows)
+        lines[:len(stored)] = stored
+        local_rows, cols = np.nonzero(lines) if self.transparent else np.indices(lines.shape).reshape(2, -1)
+        images = self.atlas.images(self.side)
+        surface.blits([(images[type_num], (int(col * self.side), int(row * self.side)))
+                       for row, col, type_num in zip(local_rows.tolist(), cols.tolist(),
+                                                     lines[local_rows, cols].tolist())], doreturn=False)
+        return surface
+
+    def get_chunk(self, chunk):
+        surface = self.chunks.get(chunk)
+        if surface is None:
+            surface = self.chunks[chunk] = self.render_chunk(chunk)
+            while len(self.chunks) > self.max_chunks:
+                self.chunks.popitem(last=False)
+        else:
+            self.chunks.move_to_end(chunk)
+        return surface
+
+    def visible_chunks(self, camera):
+        first, last = camera.visible_rows(self.side)
+        return range(first // self.chunk_rows, (last - 1) // self.chunk_rows + 1)
+
+    def update_dirty_cells(self, camera):
+        rects = []
+        if not self.dirty_cells:
+            return rects
+        cells = [cell for cell in self.dirty_cells if cell[0] // self.chunk_rows in self.chunks]
+        self.dirty_cells.clear()
+        if not cells:
+            return rects
+        rows, cols = np.array(cells, dtype=np.int64).T
+        types = self.tile_map.get_cells(rows, cols).tolist()
+        images = self.atlas.images(self.side)
+        sequences = {}
+        for row, col, type_num in zip(rows.tolist(), cols.tolist(), types):
+            chunk, local_row = divmod(row, self.chunk_rows)
+            rect = self.cell_rect(local_row, col)
+            if self.transparent and not type_num:
+                self.chunks[chunk].fill(TRANSPARENT, rect)
+            else:
+                sequences.setdefault(chunk, []).append((images[type_num], rect))
+            screen_rect = rect.move(0, self.chunk_y(chunk) - int(camera.y))
+            if screen_rect.top < self.view_height and screen_rect.bottom > 0:
+                rects.append(screen_rect.clip((0, 0, self.width, self.view_height)))
+        for chunk, sequence in sequences.items():
+            self.chunks[chunk].blits(sequence, doreturn=False)
+        return rects
+
+    def collect(self, camera):
+        rects = self.update_dirty_cells(camera)
+        if camera.y != self.last_camera_y:
+            self.full_redraw = True
+        if self.full_redraw:
+            rects = [pg.Rect(0, 0, self.width, self.view_height)]
+        self.full_redraw = False
+        self.last_camera_y = camera.y
+        return rects
+
+    def draw(self, screen, camera):
+        rects = self.collect(camera)
+        if rects:
+            self.repaint(screen, camera, rects)
+        return rects
+
+    def repaint(self, screen, camera, rects):
+        sequence = []
+        for chunk in self.visible_chunks(camera):
+            surface = self.get_chunk(chunk)
+            top = self.chunk_y(chunk) - int(camera.y)
+            for rect in rects:
+                area = pg.Rect(rect).move(0, -top).clip(surface.get_rect())
+                if area.width and area.height:
+                    sequence.append((surface, area.move(0, top), area))
+        screen.set_clip((0, 0, self.width, self.view_height))
+        screen.blits(sequence, doreturn=False)
+        screen.set_clip(None)
+
+
+class LayeredRenderer:
+
+    def __init__(self, layers, atlas, side, width, view_height, background=(200, 200, 200)):
+        self.layers = layers
+        self.atlas = atlas
+        self.side = side
+        self.width = width
+        self.view_height = view_height
+        self.background = background
+        self.renderers = {}
+        self.full_redraw = True
+
+    def renderer(self, layer):
+        renderer = self.renderers.get(id(layer))
+        if renderer is None:
+            renderer = self.renderers[id(layer)] = GridRenderer(
+                layer.tile_map, self.atlas, self.side, self.width, self.view_height, background=self.background,
+                transparent=layer is not self.layers[0], opacity=layer.opacity)
+        return renderer
+
+    def invalidate(self):
+        for renderer in self.renderers.values():
+            renderer.invalidate()
+        self.full_redraw = True
+
+    def sync_layers(self):
+        known = {id(layer) for layer in self.layers}
+        for key in [key for key in self.renderers if key not in known]:
+            renderer = self.renderers.pop(key)
+            renderer.tile_map.listeners.remove(renderer.on_cells_changed)
+        for layer in self.layers:
+            renderer = self.renderers.get(id(layer))
+            if renderer is not None and renderer.opacity != layer.opacity:
+                renderer.set_opacity(layer.opacity)
+        self.full_redraw = True
+
+    def draw(self, screen, camera):
+        rects = []
+        for layer in self.layers:
+            if layer.visible or id(layer) in self.renderers:
+                rects.extend(self.renderer(layer).collect(camera))
+        full_rect = pg.Rect(0, 0, self.width, self.view_height)
+        if self.full_redraw or full_rect in rects:
+            rects = [full_rect]
+            self.full_redraw = False
+        if rects:
+            self.repaint(screen, camera, rects)
+        return rects
+
+    def repaint(self, screen, camera, rects):
+        base = self.layers[0]
+        if not base.visible or base.opacity != 255:
+            screen.set_clip((0, 0, self.width, self.view_height))
+            for rect in rects:
+                screen.fill(self.background, rect)
+            screen.set_clip(None)
+        for layer in self.layers:
+            if layer.visible:
+                self.renderer(layer).repaint(screen, camera, rects)
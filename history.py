@@ -0,0 +1,171 @@
+from collections import deque
+
+import numpy as np
+
+from regions import runs_to_mask
+
+
+def pack_indices(flat):
+    return flat.astype(np.uint32 if flat.size == 0 or flat.max() < 2 ** 32 else np.uint64)
+
+
+class CellDelta:
+
+    def __init__(self, flat, old, new):
+        self.flat = pack_indices(flat)
+        self.old = old
+        self.new = new
+
+    @classmethod
+    def capture(cls, tile_map, rows, cols, type_num):
+        old = tile_map.get_cells(rows, cols)
+        changed = old != type_num
+        flat = rows[changed].astype(np.int64) * tile_map.cols + cols[changed]
+        return cls(flat, old[changed], np.full(flat.size, type_num, dtype=old.dtype))
+
+    @classmethod
+    def capture_mask(cls, tile_map, top, mask, type_num):
+        band = tile_map.get_rows(top, top + len(mask))
+        changed = mask & (band != type_num)
+        old = band[changed]
+        return cls(np.flatnonzero(changed) + top * tile_map.cols, old, np.full(old.size, type_num, dtype=old.dtype)), \
+            changed
+
+    @classmethod
+    def combine(cls, deltas):
+        if len(deltas) == 1:
+            return deltas[0]
+        flat = np.concatenate([delta.flat.astype(np.int64) for delta in deltas])
+        old = np.concatenate([delta.old for delta in deltas])
+        new = np.concatenate([delta.new for delta in deltas])
+        _, first = np.unique(flat, return_index=True)
+        last = flat.size - 1 - np.unique(flat[::-1], return_index=True)[1]
+        return CellDelta(flat[first], old[first], new[last])
+
+    def __len__(self):
+        return self.flat.size
+
+    @property
+    def nbytes(self):
+        return self.flat.nbytes + self.old.nbytes + self.new.nbytes
+
+    def apply(self, tile_map, undo):
+        flat = self.flat.astype(np.int64)
+        tile_map.set_cells(flat // tile_map.cols, flat % tile_map.cols, self.old if undo else self.new)
+
+
+class ClearDelta:
+
+    def __init__(self, starts, lengths, values, type_num):
+        self.starts = pack_indices(starts)
+        self.lengths = pack_indices(lengths)
+        self.values = values
+        self.type_num = type_num
+
+    @classmethod
+    def capture(cls, tile_map, type_num=0):
+        all_starts, all_lengths, all_values = [], [], []
+        for start_row, block in tile_map.iter_chunks(skip_empty=True):
+            flat = block.ravel()
+            if not flat.size:
+                continue
+            starts = np.concatenate([[0], np.flatnonzero(flat[1:] != flat[:-1]) + 1])
+            lengths = np.diff(np.concatenate([starts, [flat.size]]))
+            keep = flat[starts] != type_num
+            all_starts.append(starts[keep] + start_row * tile_map.cols)
+            all_lengths.append(lengths[keep])
+            all_values.append(flat[starts[keep]])
+        if not all_starts:
+            return cls(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64),
+                       np.empty(0, dtype=tile_map.dtype), type_num)
+        return cls(np.concatenate(all_starts), np.concatenate(all_lengths), np.concatenate(all_values), type_num)
+
+    def __len__(self):
+        return int(self.lengths.sum())
+
+    @property
+    def nbytes(self):
+        return self.starts.nbytes + self.lengths.nbytes + self.values.nbytes
+
+    def apply(self, tile_map, undo):
+        if not undo:
+            tile_map.clear(self.type_num)
+            return
+        lengths = self.lengths.astype(np.int64)
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        flat = np.repeat(self.starts.astype(np.int64), lengths) + offsets
+        tile_map.set_cells(flat // tile_map.cols, flat % tile_map.cols, np.repeat(self.values, lengths))
+
+
+class RunDelta:
+
+    def __init__(self, run_rows, starts, ends, old, new, bands=None, cols=0, window_rows=16384):
+        self.run_rows = pack_indices(run_rows)
+        self.starts = pack_indices(starts)
+        self.ends = pack_indices(ends)
+        self.old = old
+        self.new = new
+        self.bands = pack_indices(np.zeros((0, 2), dtype=np.int64) if bands is None else np.asarray(bands))
+        self.cols = cols
+        self.window_rows = window_rows
+
+    def __len__(self):
+        band_rows = self.bands[:, 1].astype(np.int64) - self.bands[:, 0]
+        return int((self.ends.astype(np.int64) - self.starts).sum() + band_rows.sum() * self.cols)
+
+    @property
+    def nbytes(self):
+        return self.run_rows.nbytes + self.starts.nbytes + self.ends.nbytes + self.bands.nbytes
+
+    def apply(self, tile_map, undo):
+        type_num = self.old if undo else self.new
+        run_rows = self.run_rows.astype(np.int64)
+        breaks = (np.flatnonzero(np.diff(run_rows // self.window_rows)) + 1).tolist()
+        for low, high in zip([0] + breaks, breaks + [len(run_rows)]):
+            if low < high:
+                top, mask = runs_to_mask(run_rows[low:high], self.starts[low:high].astype(np.int64),
+                                         self.ends[low:high].astype(np.int64), tile_map.cols)
+                tile_map.fill_mask(top, mask, type_num)
+        for start, stop in self.bands.astype(np.int64).tolist():
+            tile_map.fill_rows(start, stop, type_num)
+
+
+class History:
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.nbytes = 0
+
+    def push(self, tile_map, delta):
+        if not len(delta):
+            return
+        self.undo_stack.append((tile_map, delta))
+        self.nbytes += delta.nbytes
+        self.redo_stack = []
+        while self.nbytes > self.max_bytes and len(self.undo_stack) > 1:
+            self.nbytes -= self.undo_stack.popleft()[1].nbytes
+
+    def undo(self):
+        if not self.undo_stack:
+            return False
+        tile_map, delta = self.undo_stack.pop()
+        self.nbytes -= delta.nbytes
+        delta.apply(tile_map, undo=True)
+        self.redo_stack.append((tile_map, delta))
+        return True
+
+    def redo(self):
+        if not self.redo_stack:
+            return False
+        tile_map, delta = self.redo_stack.pop()
+        delta.apply(tile_map, undo=False)
+        self.undo_stack.append((tile_map, delta))
+        self.nbytes += delta.nbytes
+        return True
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack = []
+        self.nbytes = 0
@@ -0,0 +1,56 @@
+from level_format import LevelLayer
+from tile_map import TileMap
+
+
+class MapLayer:
+
+    def __init__(self, name, cols, palette, rows=0, visible=True, opacity=255, source=None):
+        self.name = name
+        self.cols = cols
+        self.palette = palette
+        self.rows = rows
+        self.visible = visible
+        self.opacity = opacity
+        self.source = source
+        self.data = None
+        self.listeners = []
+
+    @classmethod
+    def from_level_layer(cls, layer, palette, rows=0):
+        stored_rows, cols = layer.shape
+        return cls(layer.name, cols, palette, max(rows, stored_rows), layer.visible, layer.opacity, source=layer)
+
+    @property
+    def tile_map(self):
+        if self.data is None:
+            if self.source is None:
+                self.data = TileMap(self.cols, self.palette, rows=self.rows)
+            else:
+                self.data = TileMap.from_array(self.source.tiles, self.palette)
+                self.source = None
+                if self.data.rows < self.rows:
+                    self.data.add_rows(self.rows - self.data.rows)
+            self.data.listeners.extend(self.listeners)
+        return self.data
+
+    def loaded(self):
+        return self.data is not None
+
+    def row_count(self):
+        return self.data.rows if self.data is not None else self.rows
+
+    def add_rows(self, count):
+        if self.data is not None:
+            self.data.add_rows(count)
+        else:
+            self.rows += count
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+        if self.data is not None:
+            self.data.listeners.append(listener)
+
+    def level_layer(self):
+        if self.data is None and self.source is not None:
+            return LevelLayer(self.name, self.source.tiles, self.visible, self.opacity)
+        return LevelLayer(self.name, self.tile_map.snapshot(), self.visible, self.opacity)
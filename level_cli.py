@@ -0,0 +1,262 @@
+import argparse
+import json
+import os
+import sys
+from functools import partial
+from multiprocessing import Pool
+
+import numpy as np
+
+from collision import build_collision, collision_path, collision_tiles, parse_solid, save_collision
+from level_diff import apply_patch, diff_levels, level_cols, load_patch, merge_levels, save_patch
+from level_format import (DEFAULT_PALETTE, FLAG_COMPRESSED, iter_blocks, load_level, read_header, save_legacy_level,
+                          save_level_atomic, tile_dtype)
+from regions import find_runs, label_runs, run_edges
+
+LEVEL_EXTENSIONS = ('.lvl', '.txt')
+
+
+def find_levels(paths):
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for folder, _, files in os.walk(path):
+            for name in sorted(files):
+                if name.endswith(LEVEL_EXTENSIONS):
+                    yield os.path.join(folder, name)
+
+
+def open_level(path, width, height):
+    level = load_level(path, legacy_palette=DEFAULT_PALETTE)
+    if level.grid is None:
+        level.grid = round(level.tiles.shape[1] * height / width)
+        level.width = width
+    return level
+
+
+def write_level(path, level):
+    if path.endswith('.txt'):
+        save_legacy_level(path, level)
+    else:
+        save_level_atomic(path, level)
+
+
+def level_runs(tiles, type_num, block_rows=65536):
+    all_rows, all_starts, all_ends = [], [], []
+    for block_start in range(0, tiles.shape[0], block_rows):
+        run_rows, starts, ends = find_runs(tiles[block_start:block_start + block_rows] == type_num)
+        all_rows.append(run_rows + block_start)
+        all_starts.append(starts)
+        all_ends.append(ends)
+    if not all_rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(all_rows), np.concatenate(all_starts), np.concatenate(all_ends)
+
+
+def region_stats(tiles, type_num, connectivity):
+    run_rows, starts, ends = level_runs(tiles, type_num)
+    if not run_rows.size:
+        return {'count': 0, 'largest': 0}
+    labels = label_runs(len(run_rows), *run_edges(run_rows, starts, ends, tiles.shape[1], connectivity))
+    sizes = np.bincount(labels, weights=ends - starts)
+    return {'count': int(np.count_nonzero(sizes)), 'largest': int(sizes.max())}
+
+
+def layer_stats(tiles, palette, connectivity):
+    histogram = np.zeros(len(palette), dtype=np.int64)
+    for block in iter_blocks(tiles, 65536):
+        histogram += np.bincount(block.ravel(), minlength=len(palette))[:len(palette)]
+    return {'rows': tiles.shape[0],
+            'histogram': histogram.tolist(),
+            'fill_ratio': float(1 - histogram[0] / tiles.size) if tiles.size else 0.0,
+            'regions': {type_num: region_stats(tiles, type_num, connectivity)
+                        for type_num in range(1, len(palette)) if histogram[type_num]}}
+
+
+def level_stats(path, width, height, connectivity):
+    level = open_level(path, width, height)
+    return {'rows': level.tiles.shape[0], 'cols': level.tiles.shape[1], 'grid': level.grid,
+            'layers': {layer.name: layer_stats(layer.tiles, level.palette, connectivity) for layer in level.layers}}
+
+
+def header_problems(path):
+    problems = []
+    with open(path, 'rb') as file:
+        flags, grid, width, rows, cols, dtype, palette, layers = read_header(file)
+    if len(palette) == 0:
+        problems.append("empty palette")
+    if np.dtype(dtype) != np.dtype(tile_dtype(palette)):
+        problems.append("tile size does not match palette size")
+    if grid == 0 or width == 0 or (rows and cols == 0):
+        problems.append("invalid dimensions")
+    file_size = os.path.getsize(path)
+    for name, offset, size, layer_rows, _, _ in layers:
+        if offset + size > file_size:
+            problems.append("layer " + name + " runs past the end of the file")
+        elif not flags & FLAG_COMPRESSED and size != layer_rows * cols * np.dtype(dtype).itemsize:
+            problems.append("layer " + name + " holds " + str(size) + " bytes, expected " +
+                            str(layer_rows * cols * np.dtype(dtype).itemsize))
+    return problems
+
+
+def validate_level(path, width, height):
+    problems = header_problems(path) if path.endswith('.lvl') else []
+    if problems:
+        return {'problems': problems}
+    level = open_level(path, width, height)
+    for layer in level.layers:
+        highest = max((int(block.max()) for block in iter_blocks(layer.tiles, 65536) if block.size), default=0)
+        if highest >= len(level.palette):
+            problems.append("tile type " + str(highest) + " in layer " + layer.name + " missing from the palette")
+    return {'problems': problems}
+
+
+def convert_level(path, width, height, out_dir, compress):
+    level = open_level(path, width, height)
+    target = '.txt' if path.endswith('.lvl') else '.lvl'
+    out_path = os.path.splitext(path)[0] + target
+    if out_dir is not None:
+        out_path = os.path.join(out_dir, os.path.basename(out_path))
+    if target == '.lvl':
+        save_level_atomic(out_path, level, compress)
+    elif len(level.layers) > 1:
+        return {'output': None, 'problems': ["legacy .txt keeps only the base layer, " +
+                                             str(len(level.layers) - 1) + " layers would be dropped"]}
+    else:
+        save_legacy_level(out_path, level)
+    return {'output': out_path}
+
+
+def export_collision(path, width, height, cell_size, solid=None):
+    level = open_level(path, width, height)
+    grid = build_collision(collision_tiles(level), level.palette, solid, cell_size)
+    save_collision(collision_path(path), grid)
+    return {'output': collision_path(path), 'rects': len(grid.rects),
+            'solid_tiles': int(grid.rects[:, 2] @ grid.rects[:, 3]) if len(grid.rects) else 0}
+
+
+def diff_job(path, new_path, width, height, out):
+    old, new = open_level(path, width, height), open_level(new_path, width, height)
+    diffs = diff_levels(old, new)
+    if out is not None:
+        save_patch(out, diffs, level_cols(old, new))
+    return {'new': new_path, 'output': out, 'cells': sum(len(diff.rows) for diff in diffs),
+            'layers': {diff.name: {'cells': len(diff.rows), 'changed_rows': len(diff.changed_rows()),
+                                   'rows': [diff.old_rows, diff.new_rows]} for diff in diffs}}
+
+
+def conflict_report(conflicts, limit=20):
+    return {layer.name: {'count': len(layer.rows), 'cells': layer.cells(limit)} for layer in conflicts}
+
+
+def patch_job(path, patch_path, width, height, out, force):
+    level = open_level(path, width, height)
+    diffs, cols = load_patch(patch_path)
+    if level.layers and level_cols(level) != cols:
+        raise ValueError("patch is for levels " + str(cols) + " columns wide")
+    conflicts = apply_patch(level, diffs, force)
+    result = {'patch': patch_path, 'output': None, 'cells': sum(len(diff.rows) for diff in diffs),
+              'conflicts': conflict_report(conflicts)}
+    if conflicts and not force:
+        result['problems'] = ["patch conflicts with " + str(sum(len(layer.rows) for layer in conflicts)) + " cells"]
+        return result
+    result['output'] = out or path
+    write_level(result['output'], level)
+    return result
+
+
+def merge_job(path, ours_path, theirs_path, width, height, out, prefer):
+    base, ours, theirs = (open_level(level_path, width, height) for level_path in (path, ours_path, theirs_path))
+    merged, conflicts = merge_levels(base, ours, theirs, prefer=prefer)
+    write_level(out, merged)
+    result = {'ours': ours_path, 'theirs': theirs_path, 'output': out, 'conflicts': conflict_report(conflicts)}
+    if conflicts:
+        result['problems'] = [str(sum(len(layer.rows) for layer in conflicts)) + " conflicting cells, kept " + prefer]
+    return result
+
+
+def run_job(job, path):
+    try:
+        result = job(path)
+    except Exception as error:
+        return {'path': path, 'ok': False, 'error': str(error) or type(error).__name__}
+    result['path'] = path
+    result['ok'] = not result.get('problems')
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch tools for tile editor levels")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument('--width', type=int, default=1500, help="editor width used for legacy levels")
+    parser.add_argument('--height', type=int, default=1000, help="editor height used for legacy levels")
+    commands = parser.add_subparsers(dest='command', required=True)
+    convert = commands.add_parser('convert', help="convert between legacy .txt and binary .lvl levels")
+    convert.add_argument('--out-dir', help="write converted levels here instead of next to the source")
+    convert.add_argument('--compress', action='store_true', help="compress converted .lvl files")
+    commands.add_parser('validate', help="check dimensions, file sizes and palette ids")
+    stats = commands.add_parser('stats', help="tile histogram, fill ratio and connected regions of every layer")
+    stats.add_argument('--connectivity', type=int, choices=(4, 8), default=4)
+    collision = commands.add_parser('collision', help="export greedy meshed collision rectangles next to each level")
+    collision.add_argument('--cell-size', type=int, default=16, help="spatial index cell size in tiles")
+    collision.add_argument('--solid', type=parse_solid, help="solid tile types like 1,3-5 (default all but 0)")
+    for command in commands.choices.values():
+        command.add_argument('paths', nargs='+', help="level files or folders to search")
+    diff = commands.add_parser('diff', help="list cells that differ between two levels")
+    diff.add_argument('old')
+    diff.add_argument('new')
+    diff.add_argument('-o', '--out', help="write the differences as a patch file")
+    patch = commands.add_parser('patch', help="apply a patch written by diff to a level")
+    patch.add_argument('level')
+    patch.add_argument('patch')
+    patch.add_argument('-o', '--out', help="write the patched level here instead of over the input")
+    patch.add_argument('--force', action='store_true', help="overwrite cells that conflict with the patch")
+    merge = commands.add_parser('merge', help="three way merge of two levels edited from a common base")
+    merge.add_argument('base')
+    merge.add_argument('ours')
+    merge.add_argument('theirs')
+    merge.add_argument('-o', '--out', required=True, help="merged level path")
+    merge.add_argument('--prefer', choices=('ours', 'theirs'), default='ours', help="side kept for conflicting cells")
+    args = parser.parse_args()
+
+    if args.command in ('diff', 'patch', 'merge'):
+        if args.command == 'diff':
+            result = run_job(partial(diff_job, new_path=args.new, width=args.width, height=args.height,
+                                     out=args.out), args.old)
+        elif args.command == 'patch':
+            result = run_job(partial(patch_job, patch_path=args.patch, width=args.width, height=args.height,
+                                     out=args.out, force=args.force), args.level)
+        else:
+            result = run_job(partial(merge_job, ours_path=args.ours, theirs_path=args.theirs, width=args.width,
+                                     height=args.height, out=args.out, prefer=args.prefer), args.base)
+        print(json.dumps(result), flush=True)
+        sys.exit(0 if result['ok'] else 1)
+
+    if args.command == 'convert':
+        if args.out_dir is not None:
+            os.makedirs(args.out_dir, exist_ok=True)
+        job = partial(convert_level, width=args.width, height=args.height, out_dir=args.out_dir,
+                      compress=args.compress)
+    elif args.command == 'validate':
+        job = partial(validate_level, width=args.width, height=args.height)
+    elif args.command == 'collision':
+        job = partial(export_collision, width=args.width, height=args.height, cell_size=args.cell_size,
+                      solid=args.solid)
+    else:
+        job = partial(level_stats, width=args.width, height=args.height, connectivity=args.connectivity)
+
+    jobs = max(args.jobs or 1, 1)
+    paths = list(find_levels(args.paths))
+    failed = 0
+    with Pool(jobs) as pool:
+        results = pool.imap_unordered(partial(run_job, job), paths, chunksize=max(1, len(paths) // (jobs * 16)))
+        for result in results:
+            failed += not result['ok']
+            print(json.dumps(result), flush=True)
+    print(str(len(paths)) + " levels, " + str(failed) + " failed", file=sys.stderr)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
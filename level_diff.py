@@ -0,0 +1,380 @@
+import os
+import struct
+
+import numpy as np
+
+from level_format import Level, LevelLayer, encode_name, tile_dtype, tiles_shape
+
+PATCH_MAGIC = b'TLPT'
+PATCH_VERSION = 1
+PATCH_HEADER = struct.Struct('<4sHBIH')
+PATCH_LAYER = struct.Struct('<QQQB')
+HASH_SEED = 0x7E1E
+CHUNK_ROWS = 256
+hash_keys = {}
+
+
+def word_keys(count):
+    keys = hash_keys.get(count)
+    if keys is None:
+        keys = np.random.default_rng(HASH_SEED).integers(0, 2 ** 64 - 1, count, dtype=np.uint64, endpoint=True)
+        keys = hash_keys[count] = keys | np.uint64(1)
+    return keys
+
+
+def read_rows(tiles, start, stop, dtype=None):
+    rows = tiles_shape(tiles)[0]
+    stored = tiles[start:min(stop, rows)] if isinstance(tiles, np.ndarray) else tiles.get_rows(start, stop)
+    dtype = stored.dtype if dtype is None else dtype
+    if len(stored) == stop - start and stored.dtype == dtype:
+        return stored
+    out = np.zeros((stop - start, stored.shape[1]), dtype=dtype)
+    out[:len(stored)] = stored
+    return out
+
+
+def hash_block(block, chunk_rows=CHUNK_ROWS):
+    count = -(-len(block) // chunk_rows)
+    data = np.ascontiguousarray(block).view(np.uint8).reshape(len(block), -1)
+    if count * chunk_rows != len(block):
+        padded = np.zeros((count * chunk_rows, data.shape[1]), dtype=np.uint8)
+        padded[:len(block)] = data
+        data = padded
+    words = data.reshape(count, -1).view(np.uint64)
+    mixed = words * word_keys(words.shape[1])
+    mixed ^= mixed >> np.uint64(29)
+    return mixed.sum(axis=1, dtype=np.uint64)
+
+
+def chunk_hashes(tiles, chunk_rows=CHUNK_ROWS, dtype=None, block_chunks=256):
+    if chunk_rows % 8:
+        raise ValueError("chunk rows must be a multiple of 8")
+    rows, cols = tiles_shape(tiles)
+    out = np.zeros(-(-rows // chunk_rows), dtype=np.uint64)
+    step = chunk_rows * block_chunks
+    for start in range(0, rows if cols else 0, step):
+        stop = min(start + step, rows)
+        out[start // chunk_rows:-(-stop // chunk_rows)] = hash_block(read_rows(tiles, start, stop, dtype), chunk_rows)
+    return out
+
+
+def padded_hashes(hashes, count):
+    out = np.zeros(count, dtype=np.uint64)
+    out[:len(hashes)] = hashes
+    return out
+
+
+def diff_chunk(old, new, start, stop, dtype):
+    old_block, new_block = read_rows(old, start, stop, dtype), read_rows(new, start, stop, dtype)
+    rows, cols = np.nonzero(old_block != new_block)
+    return rows + start, cols, old_block[rows, cols], new_block[rows, cols]
+
+
+class LayerDiff:
+
+    def __init__(self, name, old_rows, new_rows, rows, cols, old, new):
+        self.name = name
+        self.old_rows = old_rows
+        self.new_rows = new_rows
+        self.rows = rows
+        self.cols = cols
+        self.old = old
+        self.new = new
+
+    def changed(self):
+        return len(self.rows) > 0 or self.old_rows != self.new_rows
+
+    def changed_rows(self):
+        return np.unique(self.rows)
+
+
+class LayerConflicts:
+
+    def __init__(self, name, rows, cols, base, ours, theirs):
+        self.name = name
+        self.rows = rows
+        self.cols = cols
+        self.base = base
+        self.ours = ours
+        self.theirs = theirs
+
+    def cells(self, limit=None):
+        return [[int(value) for value in cell] for cell in
+                zip(self.rows[:limit], self.cols[:limit], self.base[:limit], self.ours[:limit], self.theirs[:limit])]
+
+
+def diff_tiles(old, new, name='base', chunk_rows=CHUNK_ROWS, old_hashes=None, new_hashes=None, dtype=None):
+    (old_rows, cols), (new_rows, new_cols) = tiles_shape(old), tiles_shape(new)
+    if cols != new_cols:
+        raise ValueError("layer " + name + " has " + str(new_cols) + " columns, expected " + str(cols))
+    dtype = np.promote_types(old.dtype, new.dtype) if dtype is None else dtype
+    old_hashes = chunk_hashes(old, chunk_rows, dtype) if old_hashes is None else old_hashes
+    new_hashes = chunk_hashes(new, chunk_rows, dtype) if new_hashes is None else new_hashes
+    count = max(len(old_hashes), len(new_hashes))
+    changed = np.flatnonzero(padded_hashes(old_hashes, count) != padded_hashes(new_hashes, count))
+    parts = [diff_chunk(old, new, chunk * chunk_rows, (chunk + 1) * chunk_rows, dtype) for chunk in changed.tolist()]
+    if not parts:
+        empty = np.zeros(0, dtype=np.int64)
+        return LayerDiff(name, old_rows, new_rows, empty, empty, empty.astype(dtype), empty.astype(dtype))
+    rows, cols, old_values, new_values = (np.concatenate(part) for part in zip(*parts))
+    return LayerDiff(name, old_rows, new_rows, rows.astype(np.int64), cols.astype(np.int64), old_values, new_values)
+
+
+def empty_tiles(cols, dtype):
+    return np.zeros((0, cols), dtype=dtype)
+
+
+def layer_names(*levels):
+    names = []
+    for level in levels:
+        names.extend(layer.name for layer in level.layers if layer.name not in names)
+    return names
+
+
+def find_layer(level, name):
+    for layer in level.layers:
+        if layer.name == name:
+            return layer
+    return None
+
+
+def level_cols(*levels):
+    widths = {layer.shape[1] for level in levels for layer in level.layers}
+    if len(widths) > 1:
+        raise ValueError("levels have different widths " + str(sorted(widths)))
+    return widths.pop() if widths else 0
+
+
+def layer_tiles(level, name, cols, dtype):
+    layer = find_layer(level, name)
+    return empty_tiles(cols, dtype) if layer is None else layer.tiles
+
+
+def diff_levels(old, new, chunk_rows=CHUNK_ROWS):
+    cols = level_cols(old, new)
+    dtype = tile_dtype(max(old.palette, new.palette, key=len))
+    diffs = [diff_tiles(layer_tiles(old, name, cols, dtype), layer_tiles(new, name, cols, dtype), name, chunk_rows)
+             for name in layer_names(old, new)]
+    return [diff for diff in diffs if diff.changed()]
+
+
+def resized(tiles, rows, dtype):
+    out = np.zeros((rows, tiles_shape(tiles)[1]), dtype=dtype)
+    out[:min(rows, len(tiles))] = tiles[:rows]
+    return out
+
+
+def apply_patch(level, diffs, force=False):
+    cols = level_cols(level)
+    dtype = np.dtype(tile_dtype(level.palette))
+    conflicts = []
+    for diff in diffs:
+        if len(diff.new) and int(diff.new.max()) >= len(level.palette):
+            raise ValueError("patch uses tile types missing from the palette")
+        layer = find_layer(level, diff.name)
+        tiles = empty_tiles(cols, dtype) if layer is None else layer.tiles
+        rows = diff.new_rows if len(tiles) == diff.old_rows else max(len(tiles), diff.new_rows)
+        tiles = resized(tiles, rows, dtype)
+        inside = diff.rows < rows
+        patch_rows, patch_cols, old, new = diff.rows[inside], diff.cols[inside], diff.old[inside], diff.new[inside]
+        found = tiles[patch_rows, patch_cols]
+        clash = (found != old) & (found != new)
+        if clash.any():
+            conflicts.append(LayerConflicts(diff.name, patch_rows[clash], patch_cols[clash], old[clash], found[clash],
+                                            new[clash]))
+        keep = slice(None) if force else ~clash
+        tiles[patch_rows[keep], patch_cols[keep]] = new[keep]
+        if layer is None:
+            level.layers.append(LevelLayer(diff.name, tiles))
+        else:
+            level.layers[level.layers.index(layer)] = LevelLayer(diff.name, tiles, layer.visible, layer.opacity)
+    return conflicts
+
+
+def merge_tiles(base, ours, theirs, name='base', chunk_rows=CHUNK_ROWS, prefer='ours'):
+    dtype = np.promote_types(np.promote_types(base.dtype, ours.dtype), theirs.dtype)
+    base_hashes = chunk_hashes(base, chunk_rows, dtype)
+    mine = diff_tiles(base, ours, name, chunk_rows, old_hashes=base_hashes, dtype=dtype)
+    other = diff_tiles(base, theirs, name, chunk_rows, old_hashes=base_hashes, dtype=dtype)
+    merged = resized(base, max(mine.new_rows, other.new_rows), dtype)
+    cols = tiles_shape(base)[1]
+    _, mine_index, other_index = np.intersect1d(mine.rows * cols + mine.cols, other.rows * cols + other.cols,
+                                                assume_unique=True, return_indices=True)
+    clash = mine.new[mine_index] != other.new[other_index]
+    mine_index, other_index = mine_index[clash], other_index[clash]
+    first, second = (other, mine) if prefer == 'ours' else (mine, other)
+    merged[first.rows, first.cols] = first.new
+    merged[second.rows, second.cols] = second.new
+    return merged, LayerConflicts(name, mine.rows[mine_index], mine.cols[mine_index], mine.old[mine_index],
+                                  mine.new[mine_index], other.new[other_index])
+
+
+def merge_levels(base, ours, theirs, chunk_rows=CHUNK_ROWS, prefer='ours'):
+    cols = level_cols(base, ours, theirs)
+    palette = max(ours.palette, theirs.palette, key=len)
+    dtype = tile_dtype(palette)
+    layers, conflicts = [], []
+    for name in layer_names(ours, theirs):
+        tiles, layer_conflicts = merge_tiles(*(layer_tiles(level, name, cols, dtype) for level in (base, ours, theirs)),
+                                             name, chunk_rows, prefer)
+        source = find_layer(ours, name) or find_layer(theirs, name)
+        layers.append(LevelLayer(name, tiles.astype(dtype, copy=False), source.visible, source.opacity))
+        if len(layer_conflicts.rows):
+            conflicts.append(layer_conflicts)
+    return Level(None, palette, ours.grid, ours.width, layers), conflicts
+
+
+def save_patch(path, diffs, cols):
+    dtype = np.dtype(max((diff.new.dtype for diff in diffs), key=lambda dtype: dtype.itemsize, default=np.uint8))
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as file:
+        file.write(PATCH_HEADER.pack(PATCH_MAGIC, PATCH_VERSION, dtype.itemsize, cols, len(diffs)))
+        for diff in diffs:
+            name = encode_name(diff.name)
+            file.write(PATCH_LAYER.pack(diff.old_rows, diff.new_rows, len(diff.rows), len(name)))
+            file.write(name)
+            file.write(np.ascontiguousarray(diff.rows, dtype=np.uint64).tobytes())
+            file.write(np.ascontiguousarray(diff.cols, dtype=np.uint32).tobytes())
+            file.write(np.ascontiguousarray(diff.old, dtype=dtype).tobytes())
+            file.write(np.ascontiguousarray(diff.new, dtype=dtype).tobytes())
+    os.replace(temp_path, path)
+
+
+def load_patch(path):
+    with open(path, 'rb') as file:
+        data = file.read()
+    if len(data) < PATCH_HEADER.size:
+        raise ValueError("truncated patch header")
+    magic, version, itemsize, cols, count = PATCH_HEADER.unpack_from(data)
+    if magic != PATCH_MAGIC:
+        raise ValueError("not a level patch")
+    if version != PATCH_VERSION:
+        raise ValueError("unsupported patch version " + str(version))
+    dtype = np.dtype({1: np.uint8, 2: np.uint16}.get(itemsize, np.uint8))
+    offset, diffs = PATCH_HEADER.size, []
+    for _ in range(count):
+        if offset + PATCH_LAYER.size > len(data):
+            raise ValueError("truncated patch")
+        old_rows, new_rows, cells, name_size = PATCH_LAYER.unpack_from(data, offset)
+        offset += PATCH_LAYER.size
+        name = data[offset:offset + name_size].decode('utf-8')
+        offset += name_size
+        if offset + cells * (12 + 2 * dtype.itemsize) > len(data):
+            raise ValueError("truncated patch")
+        arrays = []
+        for array_dtype in (np.uint64, np.uint32, dtype, dtype):
+            arrays.append(np.frombuffer(data, dtype=array_dtype, count=cells, offset=offset))
+            offset += cells * np.dtype(array_dtype).itemsize
+        rows, patch_cols, old, new = arrays
+        diffs.append(LayerDiff(name, old_rows, new_rows, rows.astype(np.int64), patch_cols.astype(np.int64), old, new))
+    return diffs, cols
+
+
+class LayerChanges:
+
+    def __init__(self, reference, tile_map):
+        self.reference = reference if reference is not None else empty_tiles(tile_map.cols, tile_map.dtype)
+        self.tile_map = tile_map
+        self.chunk_rows = tile_map.chunk_rows
+        self.dtype = np.promote_types(self.reference.dtype, tile_map.dtype)
+        self.reference_hashes = chunk_hashes(self.reference, self.chunk_rows, self.dtype)
+        self.hashes = np.zeros(0, dtype=np.uint64)
+        self.cells = {}
+        self.count = 0
+        self.dirty = None
+        tile_map.listeners.append(self.on_cells_changed)
+
+    def close(self):
+        self.tile_map.listeners.remove(self.on_cells_changed)
+
+    def on_cells_changed(self, rows, cols):
+        if rows is None:
+            self.dirty = None
+        elif self.dirty is not None:
+            self.dirty.update(np.unique(rows // self.chunk_rows).tolist())
+
+    def refresh(self):
+        if self.dirty is not None and not self.dirty:
+            return False
+        if self.dirty is None:
+            self.hashes = chunk_hashes(self.tile_map, self.chunk_rows, self.dtype)
+        else:
+            self.hashes = padded_hashes(self.hashes, max(self.tile_map.chunk_count(), len(self.hashes)))
+            for chunk in self.dirty:
+                block = read_rows(self.tile_map, chunk * self.chunk_rows, (chunk + 1) * self.chunk_rows, self.dtype)
+                self.hashes[chunk] = hash_block(block, self.chunk_rows)[0]
+        count = max(len(self.hashes), len(self.reference_hashes))
+        changed = padded_hashes(self.hashes, count) != padded_hashes(self.reference_hashes, count)
+        if self.dirty is None:
+            self.cells = {}
+            chunks = np.flatnonzero(changed).tolist()
+        else:
+            chunks = [chunk for chunk in self.dirty if chunk < count]
+        for chunk in chunks:
+            self.cells.pop(chunk, None)
+            if changed[chunk]:
+                start = chunk * self.chunk_rows
+                rows, cols, _, _ = diff_chunk(self.reference, self.tile_map, start, start + self.chunk_rows, self.dtype)
+                if len(rows):
+                    self.cells[chunk] = rows, cols
+        self.count = sum(len(rows) for rows, _ in self.cells.values())
+        self.dirty = set()
+        return True
+
+    def cells_between(self, start, stop):
+        parts = [self.cells[chunk] for chunk in range(start // self.chunk_rows, -(-stop // self.chunk_rows))
+                 if chunk in self.cells]
+        if not parts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        rows, cols = (np.concatenate(part) for part in zip(*parts))
+        inside = (rows >= start) & (rows < stop)
+        return rows[inside], cols[inside]
+
+    def next_row(self, row):
+        chunks = sorted(chunk for chunk in self.cells if (chunk + 1) * self.chunk_rows > row)
+        for chunk in chunks:
+            rows = self.cells[chunk][0]
+            if rows.max() >= row:
+                return int(rows[rows >= row].min())
+        return None
+
+
+class ChangeTracker:
+
+    def __init__(self, reference_layers, layers):
+        self.reference = {}
+        for layer in reference_layers:
+            self.reference.setdefault(layer.name, layer)
+        self.layers = layers
+        self.changes = {}
+        self.sync_layers()
+
+    def sync_layers(self):
+        known = {id(layer) for layer in self.layers}
+        for key in [key for key in self.changes if key not in known]:
+            self.changes.pop(key).close()
+        for layer in self.layers:
+            if id(layer) not in self.changes:
+                reference = self.reference.get(layer.name)
+                self.changes[id(layer)] = LayerChanges(reference.tiles if reference is not None else None,
+                                                       layer.tile_map)
+
+    def close(self):
+        for changes in self.changes.values():
+            changes.close()
+        self.changes = {}
+
+    def refresh(self):
+        return any([changes.refresh() for changes in self.changes.values()])
+
+    def count(self):
+        return sum(changes.count for changes in self.changes.values())
+
+    def cells_between(self, start, stop):
+        parts = [changes.cells_between(start, stop) for changes in self.changes.values()]
+        rows, cols = (np.concatenate(part) for part in zip(*parts))
+        return rows, cols
+
+    def next_row(self, row):
+        rows = [found for found in (changes.next_row(row) for changes in self.changes.values()) if found is not None]
+        return min(rows) if rows else None
@@ -0,0 +1,289 @@
+import os
+import struct
+import zlib
+from functools import partial
+
+import numpy as np
+
+MAGIC = b'TLVL'
+VERSION = 2
+FLAG_COMPRESSED = 1
+HEADER = struct.Struct('<4sHHIIQIBH')
+PALETTE_ENTRY = struct.Struct('<6B')
+LAYER_COUNT = struct.Struct('<H')
+LAYER_ENTRY = struct.Struct('<QQQBBB')
+JOURNAL_MAGIC = b'TLJC'
+JOURNAL_RECORD = struct.Struct('<4sQQHI')
+LAYER_JOURNAL_MAGIC = b'TLJL'
+LAYER_JOURNAL_RECORD = struct.Struct('<4sQQH')
+LEGACY_JOURNAL_MAGIC = b'TLJR'
+LEGACY_JOURNAL_RECORD = struct.Struct('<4sQQ')
+DTYPES = {1: np.uint8, 2: np.uint16}
+DEFAULT_PALETTE = [[(200, 200, 200), (150, 150, 150)],
+                   [(255, 0, 0), (180, 0, 0)],
+                   [(0, 0, 255), (0, 0, 180)]]
+
+
+class LevelLayer:
+
+    def __init__(self, name, tiles=None, visible=True, opacity=255, loader=None, shape=None):
+        self.name = name
+        self.data = tiles
+        self.visible = visible
+        self.opacity = opacity
+        self.loader = loader
+        self.stored_shape = shape
+
+    @property
+    def tiles(self):
+        if self.data is None:
+            self.data = self.loader()
+            self.loader = None
+        return self.data
+
+    @property
+    def shape(self):
+        return tiles_shape(self.data) if self.data is not None else self.stored_shape
+
+    def loaded(self):
+        return self.data is not None
+
+
+class Level:
+
+    def __init__(self, tiles, palette, grid, width, layers=None):
+        self.layers = layers if layers is not None else [LevelLayer('base', tiles)]
+        self.palette = palette
+        self.grid = grid
+        self.width = width
+
+    @property
+    def tiles(self):
+        return self.layers[0].tiles
+
+
+def tile_dtype(palette):
+    return np.uint8 if len(palette) <= 256 else np.uint16
+
+
+def tiles_shape(tiles):
+    return tiles.shape if isinstance(tiles, np.ndarray) else (tiles.rows, tiles.cols)
+
+
+def journal_path(path):
+    return path + '.journal'
+
+
+def iter_blocks(tiles, block_rows):
+    if isinstance(tiles, np.ndarray):
+        for start in range(0, tiles.shape[0], block_rows):
+            yield tiles[start:start + block_rows]
+    else:
+        for _, block in tiles.iter_chunks():
+            yield block
+
+
+def encode_name(name, limit=255):
+    return name.encode('utf-8')[:limit].decode('utf-8', 'ignore').encode('utf-8')
+
+
+def write_layer_table(file, layers, entries):
+    for layer, (offset, size, rows) in zip(layers, entries):
+        name = encode_name(layer.name)
+        file.write(LAYER_ENTRY.pack(offset, size, rows, layer.visible, layer.opacity, len(name)))
+        file.write(name)
+
+
+def save_level(path, level, compress=False, progress=None, block_rows=65536):
+    dtype = np.dtype(tile_dtype(level.palette))
+    shapes = [tiles_shape(layer.tiles) for layer in level.layers]
+    rows, cols = max(shape[0] for shape in shapes), shapes[0][1]
+    total_rows = max(sum(shape[0] for shape in shapes), 1)
+    flags = FLAG_COMPRESSED if compress else 0
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, flags, level.grid, level.width, rows, cols,
+                               dtype.itemsize, len(level.palette)))
+        for color, selected_color in level.palette:
+            file.write(PALETTE_ENTRY.pack(*color, *selected_color))
+        file.write(LAYER_COUNT.pack(len(level.layers)))
+        table_offset = file.tell()
+        entries = [(0, 0, shape[0]) for shape in shapes]
+        write_layer_table(file, level.layers, entries)
+        written = 0
+        for index, layer in enumerate(level.layers):
+            start = file.tell()
+            compressor = zlib.compressobj(1) if compress else None
+            for block in iter_blocks(layer.tiles, block_rows):
+                data = np.ascontiguousarray(block, dtype=dtype).tobytes()
+                file.write(compressor.compress(data) if compress else data)
+                written += len(block)
+                if progress is not None:
+                    progress(written / total_rows)
+            if compress:
+                file.write(compressor.flush())
+            entries[index] = (start, file.tell() - start, shapes[index][0])
+        file.seek(table_offset)
+        write_layer_table(file, level.layers, entries)
+
+
+def sync_directory(path):
+    if os.name != 'posix':
+        return
+    descriptor = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+def save_level_atomic(path, level, compress=False, progress=None):
+    temp_path = path + '.tmp'
+    save_level(temp_path, level, compress, progress)
+    with open(temp_path, 'rb+') as file:
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+    sync_directory(path)
+    if os.path.exists(journal_path(path)):
+        os.remove(journal_path(path))
+
+
+def append_journal(path, total_rows, rows, data, layer=0):
+    rows = np.ascontiguousarray(rows, dtype=np.uint64)
+    data = np.asarray(data)
+    with open(journal_path(path), 'ab') as file:
+        file.write(JOURNAL_RECORD.pack(JOURNAL_MAGIC, total_rows, len(rows), layer, data.shape[1]))
+        file.write(rows.tobytes())
+        file.write(np.ascontiguousarray(data).tobytes())
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def apply_journal(tiles, path, layer=0):
+    with open(path, 'rb') as file:
+        data = file.read()
+    cols = tiles.shape[1]
+    offset = 0
+    while offset + LEGACY_JOURNAL_RECORD.size <= len(data):
+        magic, record_cols = data[offset:offset + 4], cols
+        if magic == LEGACY_JOURNAL_MAGIC:
+            _, total_rows, count = LEGACY_JOURNAL_RECORD.unpack_from(data, offset)
+            record_layer, start = 0, offset + LEGACY_JOURNAL_RECORD.size
+        elif magic == LAYER_JOURNAL_MAGIC and offset + LAYER_JOURNAL_RECORD.size <= len(data):
+            _, total_rows, count, record_layer = LAYER_JOURNAL_RECORD.unpack_from(data, offset)
+            start = offset + LAYER_JOURNAL_RECORD.size
+        elif magic == JOURNAL_MAGIC and offset + JOURNAL_RECORD.size <= len(data):
+            _, total_rows, count, record_layer, record_cols = JOURNAL_RECORD.unpack_from(data, offset)
+            start = offset + JOURNAL_RECORD.size
+        else:
+            break
+        end = start + count * (8 + record_cols * tiles.itemsize)
+        if end > len(data):
+            break
+        offset = end
+        if record_layer != layer or record_cols != cols:
+            continue
+        rows = np.frombuffer(data, dtype=np.uint64, count=count, offset=start)
+        values = np.frombuffer(data, dtype=tiles.dtype, count=count * tiles.shape[1],
+                               offset=start + count * 8).reshape(count, tiles.shape[1])
+        if total_rows > tiles.shape[0]:
+            grown = np.zeros((total_rows, tiles.shape[1]), dtype=tiles.dtype)
+            grown[:tiles.shape[0]] = tiles
+            tiles = grown
+        tiles[rows.astype(np.intp)] = values
+    return tiles
+
+
+def read_exact(file, size, what):
+    data = file.read(size)
+    if len(data) < size:
+        raise ValueError("truncated " + what)
+    return data
+
+
+def read_header(file):
+    magic, version, flags, grid, width, rows, cols, itemsize, palette_size = \
+        HEADER.unpack(read_exact(file, HEADER.size, "level header"))
+    if magic != MAGIC:
+        raise ValueError("not a level file")
+    if version not in (1, VERSION):
+        raise ValueError("unsupported level version " + str(version))
+    if itemsize not in DTYPES:
+        raise ValueError("unsupported tile size " + str(itemsize))
+    palette = []
+    for _ in range(palette_size):
+        entry = PALETTE_ENTRY.unpack(read_exact(file, PALETTE_ENTRY.size, "palette"))
+        palette.append([entry[:3], entry[3:]])
+    if version == 1:
+        offset = file.tell()
+        size = rows * cols * itemsize if not flags & FLAG_COMPRESSED else os.fstat(file.fileno()).st_size - offset
+        return flags, grid, width, rows, cols, DTYPES[itemsize], palette, [('base', offset, size, rows, True, 255)]
+    layers = []
+    for _ in range(LAYER_COUNT.unpack(read_exact(file, LAYER_COUNT.size, "layer table"))[0]):
+        offset, size, layer_rows, visible, opacity, name_size = \
+            LAYER_ENTRY.unpack(read_exact(file, LAYER_ENTRY.size, "layer table"))
+        name = read_exact(file, name_size, "layer table").decode('utf-8')
+        layers.append((name, offset, size, layer_rows, bool(visible), opacity))
+    if not layers:
+        raise ValueError("level has no layers")
+    return flags, grid, width, rows, cols, DTYPES[itemsize], palette, layers
+
+
+def read_layer(path, flags, dtype, cols, offset, size, rows, index):
+    if flags & FLAG_COMPRESSED:
+        with open(path, 'rb') as file:
+            file.seek(offset)
+            data = read_exact(file, size, "compressed layer")
+        try:
+            data = zlib.decompress(data)
+        except zlib.error as error:
+            raise ValueError("corrupt compressed layer: " + str(error))
+        if len(data) != rows * cols * np.dtype(dtype).itemsize:
+            raise ValueError("compressed layer holds " + str(len(data)) + " bytes, expected " +
+                             str(rows * cols * np.dtype(dtype).itemsize))
+        tiles = np.frombuffer(data, dtype=dtype).reshape(rows, cols).copy()
+    elif rows * cols == 0:
+        tiles = np.zeros((rows, cols), dtype=dtype)
+    else:
+        tiles = np.memmap(path, dtype=dtype, mode='c', offset=offset, shape=(rows, cols))
+    if os.path.exists(journal_path(path)):
+        tiles = apply_journal(tiles, journal_path(path), index)
+    return tiles
+
+
+def load_level(path, legacy_palette=None):
+    if path.endswith('.txt'):
+        return load_legacy_level(path, legacy_palette)
+    with open(path, 'rb') as file:
+        flags, grid, width, rows, cols, dtype, palette, entries = read_header(file)
+    layers = [LevelLayer(name, visible=visible, opacity=opacity, shape=(layer_rows, cols),
+                         loader=partial(read_layer, path, flags, dtype, cols, offset, size, layer_rows, index))
+              for index, (name, offset, size, layer_rows, visible, opacity) in enumerate(entries)]
+    return Level(None, palette, grid, width, layers)
+
+
+def load_legacy_level(path, palette=None):
+    with open(path, 'rb') as file:
+        data = file.read()
+    lines = data.split(b'\n')
+    if lines and not lines[-1]:
+        lines.pop()
+    cols = len(lines[0]) if lines else 0
+    if any(len(line) != cols for line in lines):
+        raise ValueError("legacy level rows have different lengths")
+    tiles = np.frombuffer(b''.join(lines), dtype=np.uint8).reshape(len(lines), cols) - ord('0')
+    if tiles.size and tiles.max() > 9:
+        raise ValueError("legacy level contains non digit tiles")
+    if palette is not None and tiles.size and tiles.max() >= len(palette):
+        raise ValueError("legacy level uses tile types missing from the palette")
+    return Level(tiles, palette, None, None)
+
+
+def save_legacy_level(path, level, block_rows=65536):
+    with open(path, 'wb') as file:
+        for block in iter_blocks(level.tiles, block_rows):
+            if block.size and block.max() > 9:
+                raise ValueError("legacy levels only store tile types 0 to 9")
+            lines = np.empty((block.shape[0], block.shape[1] + 1), dtype=np.uint8)
+            lines[:, :-1] = block + ord('0')
+            lines[:, -1] = ord('\n')
+            file.write(lines.tobytes())
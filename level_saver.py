@@ -0,0 +1,103 @@
+import os
+import queue
+import threading
+
+import numpy as np
+
+from collision import build_collision, collision_path, collision_tiles, save_collision
+from level_format import Level, append_journal, journal_path, save_level_atomic
+from tile_map import TileMap
+
+
+class LevelSaver:
+
+    def __init__(self, compact_ratio=0.25, solid=None):
+        self.compact_ratio = compact_ratio
+        self.solid = solid
+        self.status = ""
+        self.progress = 1.0
+        self.jobs = queue.Queue()
+        self.pending = 0
+        self.failed = False
+        self.stale_collision = set()
+        self.written = set()
+        self.lock = threading.Lock()
+        self.worker = threading.Thread(target=self.work, daemon=True)
+        self.worker.start()
+
+    def busy(self):
+        return self.pending > 0
+
+    def submit(self, job):
+        with self.lock:
+            self.pending += 1
+        self.jobs.put(job)
+
+    def save(self, path, layers, grid, width, compress=False, collision=True):
+        level = Level(None, layers[0].palette, grid, width, [layer.level_layer() for layer in layers])
+        self.written.add(path)
+        self.submit(('full', path, level, compress, collision, self.solid))
+
+    def needs_full_save(self, path, layers, dirty_rows):
+        if self.failed or dirty_rows is None or path not in self.written or not os.path.exists(path):
+            return True
+        total_rows = sum(layer.row_count() for layer in layers)
+        if sum(len(rows) for rows in dirty_rows.values()) > self.compact_ratio * total_rows:
+            return True
+        journal = journal_path(path)
+        return os.path.exists(journal) and os.path.getsize(journal) > os.path.getsize(path)
+
+    def autosave(self, path, layers, grid, width, dirty_rows):
+        if self.needs_full_save(path, layers, dirty_rows):
+            self.save(path, layers, grid, width)
+            return
+        for index, layer_rows in dirty_rows.items():
+            if not layer_rows:
+                continue
+            tile_map = layers[index].tile_map
+            rows = np.fromiter(sorted(layer_rows), dtype=np.int64, count=len(layer_rows))
+            self.submit(('journal', path, tile_map.rows, rows, tile_map.take_rows(rows), index))
+
+    def work(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            try:
+                if job[0] == 'full':
+                    _, path, level, compress, collision, solid = job
+                    self.status = "Saving " + os.path.basename(path)
+                    self.progress = 0.0
+                    try:
+                        save_level_atomic(path, level, compress, self.set_progress)
+                        if collision:
+                            grid = build_collision(collision_tiles(level), level.palette, solid)
+                            save_collision(collision_path(path), grid)
+                            self.stale_collision.discard(path)
+                    finally:
+                        for layer in level.layers:
+                            if isinstance(layer.data, TileMap) and layer.data.parent is not None:
+                                layer.data.release()
+                    self.failed = False
+                else:
+                    _, path, total_rows, rows, data, layer = job
+                    self.status = "Autosaving " + os.path.basename(path)
+                    append_journal(path, total_rows, rows, data, layer)
+                    self.stale_collision.add(path)
+                self.progress = 1.0
+                self.status = "Saved " + os.path.basename(path)
+                if path in self.stale_collision:
+                    self.status += " (collision stale)"
+            except Exception as error:
+                self.status = "Save failed: " + str(error)
+                self.failed = True
+            finally:
+                with self.lock:
+                    self.pending -= 1
+
+    def set_progress(self, progress):
+        self.progress = progress
+
+    def close(self):
+        self.jobs.put(None)
+        self.worker.join()
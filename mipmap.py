@@ -0,0 +1,395 @@
+import math
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pygame as pg
+
+
+PENDING = object()
+
+
+def downsample(image, fill):
+    height, width = image.shape[:2]
+    if height % 2 or width % 2:
+        padded = np.empty((height + height % 2, width + width % 2, 3), dtype=np.uint8)
+        padded[height:] = fill
+        padded[:, width:] = fill
+        padded[:height, :width] = image
+        image = padded
+    pairs = np.add(image[0::2], image[1::2], dtype=np.uint16)
+    total = pairs[:, 0::2] + pairs[:, 1::2]
+    total >>= 2
+    return total.astype(np.uint8)
+
+
+class MipPyramid:
+
+    def __init__(self, layers, palette, background=(200, 200, 200), block_rows=4096, memory_budget=16 * 1024 * 1024,
+                 paged_levels=3):
+        self.layers = layers
+        self.colors = np.array([entry[0] for entry in palette], dtype=np.uint8)
+        self.background = np.array(background, dtype=np.uint8)
+        self.block_rows = max(block_rows - block_rows % 2, 2)
+        self.memory_budget = memory_budget
+        self.paged_levels = paged_levels
+        self.blocks = {}
+        self.resident = OrderedDict()
+        self.depth = 0
+        self.rows = 0
+        self.dirty_cells = []
+        self.dirty_rows = set()
+        self.version = 0
+        self.deadline = None
+        self.built_blocks = 0
+        self.attached = set()
+        self.sync_layers()
+
+    def sync_layers(self):
+        for layer in self.layers:
+            if id(layer) not in self.attached:
+                self.attached.add(id(layer))
+                layer.add_listener(self.on_cells_changed)
+        self.invalidate()
+
+    def invalidate(self):
+        self.blocks = {}
+        self.resident = OrderedDict()
+        self.depth = 0
+        self.dirty_cells = []
+        self.dirty_rows = set()
+        self.version += 1
+
+    def on_cells_changed(self, rows, cols):
+        self.version += 1
+        if not self.blocks:
+            return
+        if rows is None:
+            self.invalidate()
+        elif rows.size * 4 > self.block_rows:
+            self.drop_blocks(1, np.unique(rows // self.block_rows))
+        elif cols is None:
+            self.dirty_rows.update(rows.tolist())
+        else:
+            self.dirty_cells.append((rows, cols))
+
+    def drop_blocks(self, level, indices):
+        for level in range(level, self.depth + 1):
+            for index in indices.tolist():
+                self.blocks.pop((level, index), None)
+                self.resident.pop((level, index), None)
+            indices = np.unique(indices // 2)
+
+    @property
+    def cols(self):
+        return self.layers[0].cols
+
+    def empty_color(self):
+        return self.colors[0] if self.layers[0].visible else self.background
+
+    def row_count(self):
+        return max(layer.row_count() for layer in self.layers)
+
+    def composite(self, shape, read):
+        if self.layers[0].visible:
+            out = np.take(self.colors, read(self.layers[0].tile_map), axis=0)
+        else:
+            out = np.empty(shape + (3,), dtype=np.uint8)
+            out[:] = self.background
+        for layer in self.layers[1:]:
+            if not layer.visible:
+                continue
+            types = read(layer.tile_map)
+            if types.any():
+                mask = types != 0
+                out[mask] = self.colors[types[mask]]
+        return out
+
+    def composite_range(self, start, stop):
+        def read(tile_map):
+            types = np.zeros((stop - start, self.cols), dtype=tile_map.dtype)
+            stored = tile_map.get_rows(start, stop, cache=False)
+            types[:len(stored)] = stored
+            return types
+        return self.composite((stop - start, self.cols), read)
+
+    def composite_rows(self, rows):
+        return self.composite((len(rows), self.cols), lambda tile_map: tile_map.take_rows(rows))
+
+    def composite_cells(self, rows, cols):
+        return self.composite((len(rows),), lambda tile_map: tile_map.get_cells(rows, cols))
+
+    def level_shape(self, level):
+        return -(-self.rows // 2 ** level), -(-self.cols // 2 ** level)
+
+    def block_height(self, level, index):
+        return min(self.block_rows // 2, self.level_shape(level)[0] - index * (self.block_rows // 2))
+
+    def block_count(self, level):
+        return -(-self.level_shape(level)[0] // (self.block_rows // 2))
+
+    def stored_between(self, start, stop):
+        return any(layer.visible and layer.row_count() > start and layer.tile_map.stored_between(start, stop)
+                   for layer in self.layers)
+
+    def build_block(self, level, index):
+        if level == 1:
+            start = index * self.block_rows
+            stop = min(start + self.block_rows, self.rows)
+            if not self.stored_between(start, stop):
+                return None
+            block = downsample(self.composite_range(start, stop), self.empty_color())
+            return None if (block == self.empty_color()).all() else block
+        children = [self.block(level - 1, child) for child in (index * 2, index * 2 + 1)
+                    if child < self.block_count(level - 1)]
+        if any(child is PENDING for child in children):
+            return PENDING
+        if all(child is None for child in children):
+            return None
+        return downsample(np.concatenate([self.filled(level - 1, index * 2 + offset) if child is None else child
+                                          for offset, child in enumerate(children)]), self.empty_color())
+
+    def filled(self, level, index):
+        block = np.empty((self.block_height(level, index), self.level_shape(level)[1], 3), dtype=np.uint8)
+        block[:] = self.empty_color()
+        return block
+
+    def block(self, level, index):
+        key = (level, index)
+        if key in self.blocks:
+            if key in self.resident:
+                self.resident.move_to_end(key)
+            return self.blocks[key]
+        if self.deadline is not None and self.built_blocks and time.perf_counter() > self.deadline:
+            return PENDING
+        block = self.build_block(level, index)
+        if block is PENDING:
+            return PENDING
+        self.blocks[key] = block
+        self.built_blocks += level == 1
+        self.depth = max(self.depth, level)
+        if block is not None:
+            self.page(key, block)
+        return block
+
+    def page(self, key, block):
+        if key[0] > self.paged_levels:
+            return
+        self.resident[key] = block.nbytes
+        total = sum(self.resident.values())
+        while total > self.memory_budget and len(self.resident) > 1:
+            evicted, size = self.resident.popitem(last=False)
+            del self.blocks[evicted]
+            total -= size
+
+    def resize(self, rows):
+        last = max(min(self.rows, rows) - 1, 0) // self.block_rows
+        for key in [key for key in self.blocks if key[1] >= last >> (key[0] - 1)]:
+            del self.blocks[key]
+            self.resident.pop(key, None)
+        self.rows = rows
+
+    def refresh(self):
+        rows = self.row_count()
+        if not self.blocks:
+            self.rows = rows
+            self.dirty_cells, self.dirty_rows = [], set()
+        if rows != self.rows:
+            self.resize(rows)
+        if self.dirty_rows:
+            self.update_rows(np.array(sorted(self.dirty_rows), dtype=np.int64))
+            self.dirty_rows = set()
+        if self.dirty_cells:
+            rows = np.concatenate([cells[0] for cells in self.dirty_cells]).astype(np.int64)
+            cols = np.concatenate([cells[1] for cells in self.dirty_cells]).astype(np.int64)
+            self.update_cells(rows, cols)
+            self.dirty_cells = []
+
+    def group_blocks(self, level, rows):
+        indices = rows // (self.block_rows // 2)
+        for index in np.unique(indices).tolist():
+            yield index, np.flatnonzero(indices == index)
+
+    def built(self, level, rows):
+        keep = np.zeros(len(rows), dtype=bool)
+        for index, group in self.group_blocks(level, rows):
+            keep[group] = (level, index) in self.blocks
+        return keep
+
+    def read_level(self, level, rows, cols=None):
+        width = self.level_shape(level)[1]
+        out = np.empty((len(rows), 3) if cols is not None else (len(rows), width, 3), dtype=np.uint8)
+        out[:] = self.empty_color()
+        inside = np.flatnonzero((rows >= 0) & (rows < self.level_shape(level)[0]))
+        for index, group in self.group_blocks(level, rows[inside]):
+            group = inside[group]
+            block = self.block(level, index)
+            if block is None:
+                continue
+            local = rows[group] - index * (self.block_rows // 2)
+            if cols is None:
+                out[group] = block[local]
+            else:
+                valid = cols[group] < width
+                out[group[valid]] = block[local[valid], cols[group][valid]]
+        return out
+
+    def write_level(self, level, rows, values, cols=None):
+        for index, group in self.group_blocks(level, rows):
+            block = self.blocks.get((level, index), False)
+            if block is False:
+                continue
+            if block is None:
+                block = self.blocks[(level, index)] = self.filled(level, index)
+                self.page((level, index), block)
+            local = rows[group] - index * (self.block_rows // 2)
+            if cols is None:
+                block[local] = values[group]
+            else:
+                block[local, cols[group]] = values[group]
+
+    def child_rows(self, level, rows):
+        if level == 1:
+            return self.composite_rows(rows)
+        return self.read_level(level - 1, rows)
+
+    def child_cells(self, level, rows, cols):
+        if level > 1:
+            return self.read_level(level - 1, rows, cols)
+        out = np.empty((len(rows), 3), dtype=np.uint8)
+        out[:] = self.empty_color()
+        inside = cols < self.cols
+        out[inside] = self.composite_cells(rows[inside], cols[inside])
+        return out
+
+    def update_rows(self, rows):
+        for level in range(1, self.depth + 1):
+            rows = np.unique(rows // 2)
+            rows = rows[rows < self.level_shape(level)[0]]
+            built = rows[self.built(level, rows)]
+            if not len(built):
+                continue
+            pairs = np.stack([self.child_rows(level, built * 2), self.child_rows(level, built * 2 + 1)], axis=1)
+            self.write_level(level, built, downsample(pairs.reshape((-1,) + pairs.shape[2:]), self.empty_color()))
+
+    def update_cells(self, rows, cols):
+        for level in range(1, self.depth + 1):
+            parents = np.unique((rows // 2) * (self.cols + 1) + cols // 2)
+            rows, cols = np.divmod(parents, self.cols + 1)
+            inside = rows < self.level_shape(level)[0]
+            rows, cols = rows[inside], cols[inside]
+            built = self.built(level, rows)
+            if not built.any():
+                continue
+            total = np.zeros((int(built.sum()), 3), dtype=np.uint16)
+            for row_offset in (0, 1):
+                for col_offset in (0, 1):
+                    total += self.child_cells(level, rows[built] * 2 + row_offset, cols[built] * 2 + col_offset)
+            self.write_level(level, rows[built], (total // 4).astype(np.uint8), cols[built])
+
+    def prepare(self, level, start, stop, deadline):
+        self.refresh()
+        half = self.block_rows // 2
+        stop = min(stop, self.level_shape(level)[0])
+        self.deadline, self.built_blocks = deadline, 0
+        try:
+            return all(self.block(level, index) is not PENDING
+                       for index in range(max(start, 0) // half, -(-stop // half)))
+        finally:
+            self.deadline = None
+
+    def image(self, level, start, stop):
+        if level == 0:
+            return self.composite_range(start, stop)
+        self.refresh()
+        return self.read_level(level, np.arange(start, stop))
+
+
+def image_surface(image):
+    return pg.surfarray.make_surface(image.swapaxes(0, 1))
+
+
+class MipRenderer:
+
+    def __init__(self, pyramid, side, width, view_height, background=(200, 200, 200)):
+        self.pyramid = pyramid
+        self.side = side
+        self.width = width
+        self.view_height = view_height
+        self.background = background
+        self.drawn_state = None
+
+    def draw(self, screen, camera, zoom, area=None):
+        state = (camera.y, zoom, self.pyramid.version)
+        if state == self.drawn_state:
+            return []
+        self.drawn_state = state
+        tile_size = self.side / 2 ** zoom
+        level = max(math.ceil(math.log2(1 / tile_size)), 0) if tile_size < 1 else 0
+        texel_size = tile_size * 2 ** level
+        first_row = camera.y / self.side
+        start = int(first_row // 2 ** level)
+        stop = int(math.ceil((first_row + self.view_height / tile_size) / 2 ** level)) + 1
+        image = self.pyramid.image(level, start, stop)
+        surface = pg.transform.scale(image_surface(image), (max(round(image.shape[1] * texel_size), 1),
+                                                           max(round(image.shape[0] * texel_size), 1)))
+        view = pg.Rect(0, 0, self.width, self.view_height)
+        screen.set_clip(view if area is None else view.clip(area))
+        screen.fill(self.background, view)
+        screen.blit(surface, (0, round((start * 2 ** level - first_row) * tile_size)))
+        screen.set_clip(None)
+        return [view]
+
+
+class Minimap:
+
+    def __init__(self, pyramid, rect, side, build_ms=8):
+        self.pyramid = pyramid
+        self.rect = pg.Rect(rect)
+        self.side = side
+        self.build_ms = build_ms
+        self.surface = None
+        self.cached_version = None
+        self.drawn_state = None
+
+    def level_for(self, rows):
+        return max(math.ceil(math.log2(max(rows / self.rect.height, 1))), 1)
+
+    def building(self):
+        return self.cached_version != self.pyramid.version
+
+    def render(self):
+        rows = self.pyramid.row_count()
+        level = self.level_for(rows)
+        stop = -(-rows // 2 ** level)
+        if not self.pyramid.prepare(level, 0, stop, time.perf_counter() + self.build_ms / 1000):
+            return
+        image = self.pyramid.image(level, 0, stop)
+        self.surface = pg.transform.smoothscale(image_surface(image), self.rect.size)
+        self.cached_version = self.pyramid.version
+
+    def view_rect(self, camera, zoom):
+        rows = max(self.pyramid.row_count(), 1)
+        first = camera.y / self.side
+        shown = camera.view_height / (self.side / 2 ** zoom)
+        top = self.rect.y + first / rows * self.rect.height
+        height = max(shown / rows * self.rect.height, 2)
+        return pg.Rect(self.rect.x, top, self.rect.width, height).clip(self.rect)
+
+    def draw(self, screen, camera, zoom, force=False):
+        state = (camera.y, zoom, self.pyramid.version)
+        if state == self.drawn_state and not force:
+            return None
+        if self.building():
+            self.render()
+        self.drawn_state = None if self.building() else state
+        if self.surface is None:
+            screen.fill(self.pyramid.empty_color(), self.rect)
+        else:
+            screen.blit(self.surface, self.rect)
+        pg.draw.rect(screen, (0, 0, 0), self.rect, 1)
+        pg.draw.rect(screen, (255, 255, 0), self.view_rect(camera, zoom), 2)
+        return self.rect
+
+    def row_at(self, pos):
+        return (pos[1] - self.rect.y) / self.rect.height * max(self.pyramid.row_count(), 1)
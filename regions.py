@@ -0,0 +1,112 @@
+import numpy as np
+
+
+def find_runs(mask):
+    stride = mask.shape[1] + 1
+    padded = np.zeros((mask.shape[0], stride), dtype=bool)
+    padded[:, :-1] = mask
+    flat = padded.ravel()
+    changes = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    if flat.size and flat[0]:
+        changes = np.concatenate([[0], changes])
+    run_rows, starts = np.divmod(changes[0::2], stride)
+    return run_rows, starts, changes[1::2] - run_rows * stride
+
+
+def run_edges(run_rows, starts, ends, cols, connectivity=4):
+    extra = 1 if connectivity == 8 else 0
+    stride = cols + 2
+    below = (run_rows + 1) * stride
+    low = np.searchsorted(run_rows * stride + ends, below + starts - extra, side='right')
+    high = np.maximum(np.searchsorted(run_rows * stride + starts, below + ends + extra, side='left'), low)
+    counts = high - low
+    first = np.repeat(np.arange(len(low)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return first, np.repeat(low, counts) + offsets
+
+
+def label_runs(count, first, second):
+    labels = np.arange(count)
+    while True:
+        first_labels, second_labels = labels[first], labels[second]
+        if np.array_equal(first_labels, second_labels):
+            return labels
+        lowest = np.minimum(first_labels, second_labels)
+        np.minimum.at(labels, first_labels, lowest)
+        np.minimum.at(labels, second_labels, lowest)
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+
+
+def runs_to_mask(run_rows, starts, ends, cols):
+    top = int(run_rows.min())
+    stride = cols + 1
+    toggles = np.zeros((int(run_rows.max()) - top + 1) * stride, dtype=bool)
+    toggles[(run_rows - top) * stride + starts] = True
+    toggles[(run_rows - top) * stride + ends] = True
+    return top, np.logical_xor.accumulate(toggles).reshape(-1, stride)[:, :cols]
+
+
+def flood_fill_runs(tiles, row, col, connectivity=4):
+    run_rows, starts, ends = find_runs(tiles == tiles[row, col])
+    stride = tiles.shape[1] + 2
+    seed = np.searchsorted(run_rows * stride + ends, row * stride + col, side='right')
+    labels = label_runs(len(run_rows), *run_edges(run_rows, starts, ends, tiles.shape[1], connectivity))
+    region = labels == labels[seed]
+    return run_rows[region], starts[region], ends[region]
+
+
+def flood_fill_chunks(tile_map, row, col, connectivity=4):
+    value = tile_map.get(row, col)
+    parts, links, bands = [], [], []
+    count, seed, band_start = 0, None, None
+
+    def add_band(start, stop):
+        nonlocal count, seed
+        edge_rows = np.unique([start, stop - 1])
+        parts.append((edge_rows, np.zeros(len(edge_rows), dtype=np.int64), np.full(len(edge_rows), tile_map.cols)))
+        links.append((count, count + len(edge_rows) - 1))
+        bands.append((start, stop))
+        if start <= row < stop:
+            seed = count
+        count += len(edge_rows)
+
+    for chunk in range(tile_map.chunk_count()):
+        start = chunk * tile_map.chunk_rows
+        stored = tile_map.stored(chunk)
+        same = tile_map.chunk(chunk, cache=False)[:tile_map.rows - start] == value if stored else None
+        if same.all() if stored else not value:
+            band_start = start if band_start is None else band_start
+            continue
+        if band_start is not None:
+            add_band(band_start, start)
+            band_start = None
+        if stored:
+            run_rows, starts, ends = find_runs(same)
+            parts.append((run_rows + start, starts, ends))
+            count += len(run_rows)
+    if band_start is not None:
+        add_band(band_start, tile_map.rows)
+    run_rows, starts, ends = (np.concatenate(part).astype(np.int64) for part in zip(*parts))
+    links = np.array(links, dtype=np.int64).reshape(-1, 2)
+    first, second = run_edges(run_rows, starts, ends, tile_map.cols, connectivity)
+    labels = label_runs(count, np.concatenate([first, links[:, 0]]), np.concatenate([second, links[:, 1]]))
+    if seed is None:
+        stride = tile_map.cols + 2
+        seed = np.searchsorted(run_rows * stride + ends, row * stride + col, side='right')
+    region = labels == labels[seed]
+    region[links.ravel()] = False
+    picked = [band for band, (node, _) in zip(bands, links.tolist()) if labels[node] == labels[seed]]
+    return run_rows[region], starts[region], ends[region], np.array(picked, dtype=np.int64).reshape(-1, 2)
+
+
+def rect_runs(start, end, shape):
+    top, bottom = sorted((start[0], end[0]))
+    left, right = sorted((start[1], end[1]))
+    top, left = max(top, 0), max(left, 0)
+    bottom, right = min(bottom, shape[0] - 1), min(right, shape[1] - 1)
+    run_rows = np.arange(top, bottom + 1) if left <= right else np.empty(0, dtype=np.int64)
+    return run_rows, np.full(run_rows.size, left), np.full(run_rows.size, right + 1)
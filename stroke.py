@@ -0,0 +1,44 @@
+import numpy as np
+
+
+def line_cells(start, end):
+    steps = max(abs(end[0] - start[0]), abs(end[1] - start[1]))
+    if steps == 0:
+        return np.array([start[0]]), np.array([start[1]])
+    t = np.arange(steps + 1) / steps
+    rows = np.rint(start[0] + (end[0] - start[0]) * t).astype(np.int64)
+    cols = np.rint(start[1] + (end[1] - start[1]) * t).astype(np.int64)
+    return rows, cols
+
+
+class Stroke:
+
+    def __init__(self):
+        self.points = []
+        self.last_cell = None
+
+    def add(self, cell):
+        self.points.append(cell)
+
+    def end(self):
+        self.points = []
+        self.last_cell = None
+
+    def rasterize(self, row_count, col_count):
+        segments_rows, segments_cols = [], []
+        for cell in self.points:
+            if cell is None:
+                self.last_cell = None
+                continue
+            rows, cols = line_cells(self.last_cell if self.last_cell is not None else cell, cell)
+            segments_rows.append(rows)
+            segments_cols.append(cols)
+            self.last_cell = cell
+        self.points = []
+        if not segments_rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        rows = np.concatenate(segments_rows)
+        cols = np.concatenate(segments_cols)
+        inside = (rows >= 0) & (rows < row_count) & (cols >= 0) & (cols < col_count)
+        flat = np.unique(rows[inside] * col_count + cols[inside])
+        return flat // col_count, flat % col_count
@@ -0,0 +1,70 @@
+import pygame as pg
+import pytest
+
+from tile_atlas import TileAtlas
+import tile_editor2
+from tile_editor2 import TileEditor
+
+
+@pytest.fixture
+def editor():
+    pg.init()
+    editor = TileEditor(autosave_interval=0)
+    editor.dialog_box.texts[0].answer = "20"
+    editor.end_box()
+    editor.grow_rows(2000)
+    yield editor
+    editor.saver.close()
+    pg.quit()
+
+
+def wheel(editor, monkeypatch, pos, y):
+    monkeypatch.setattr(pg.mouse, 'get_pos', lambda: pos)
+    pg.event.clear()
+    button = 4 if y > 0 else 5
+    pg.event.post(pg.event.Event(pg.MOUSEWHEEL, x=0, y=y, flipped=False))
+    pg.event.post(pg.event.Event(pg.MOUSEBUTTONDOWN, pos=pos, button=button))
+    pg.event.post(pg.event.Event(pg.MOUSEBUTTONUP, pos=pos, button=button))
+    editor.handle_events()
+
+
+def test_wheel_zoom_out_sticks(editor, monkeypatch):
+    wheel(editor, monkeypatch, (300, 300), -1)
+    assert editor.zoom == 1
+    wheel(editor, monkeypatch, (300, 300), -1)
+    assert editor.zoom == 2
+    wheel(editor, monkeypatch, (300, 300), 1)
+    assert editor.zoom == 1
+
+
+@pytest.mark.parametrize('tool', ['paint', 'fill', 'rect'])
+def test_wheel_does_not_paint(editor, monkeypatch, tool):
+    editor.tool = tool
+    editor.selected_type = 1
+    wheel(editor, monkeypatch, (300, 300), 1)
+    assert editor.zoom == 0
+    assert not editor.tile_map.to_array().any()
+    assert not editor.history.undo_stack
+
+
+def test_wheel_over_palette_keeps_selection(editor, monkeypatch):
+    palette = [[(index * 6, 0, 0), (index * 3, 0, 0)] for index in range(40)]
+    editor.atlas = TileAtlas(palette)
+    editor.types = palette
+    editor.setup_grid()
+    editor.selected_type = 3
+    pos = editor.menu_slots[5][1].center
+    wheel(editor, monkeypatch, pos, -1)
+    assert editor.menu_page == 1
+    assert editor.selected_type == 3
+    assert not editor.history.undo_stack
+
+
+def test_compare_failure_shows_in_status(editor, monkeypatch, tmp_path):
+    missing = str(tmp_path / 'missing.lvl')
+    monkeypatch.setattr(tile_editor2.DialogBox, 'run_and_return_answers', lambda self, screen, types: [missing])
+    editor.compare_with_file()
+    assert editor.changes is None
+    assert editor.message.startswith("Compare failed")
+    editor.draw_status()
+    assert editor.message in editor.drawn_status
@@ -0,0 +1,28 @@
+import pygame as pg
+
+from frame_scheduler import FrameScheduler
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0
+
+    def tick(self, fps=0):
+        elapsed = int(1000 / fps) if fps else 0
+        self.now += elapsed
+        return elapsed
+
+
+def test_first_frame_after_idle_runs_one_update(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(pg.time, 'get_ticks', lambda: clock.now)
+    scheduler = FrameScheduler(fps=50, update_rate=50, idle_fps=10, idle_after=1000)
+    scheduler.clock = clock
+    updates = []
+    events = [False] * 100 + [True] * 3
+    for had_events in events:
+        updates.append(0)
+        scheduler.frame(lambda: had_events, lambda: updates.__setitem__(-1, updates[-1] + 1), lambda: None)
+    assert scheduler.idle() is False
+    assert updates[-3:] == [1, 1, 1]
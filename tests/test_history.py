@@ -0,0 +1,102 @@
+import numpy as np
+
+from history import CellDelta, ClearDelta, History, RunDelta
+from level_format import DEFAULT_PALETTE
+from regions import flood_fill_chunks, rect_runs, runs_to_mask
+from tile_map import TileMap
+
+
+def make_map(seed=0):
+    rng = np.random.default_rng(seed)
+    tiles = (rng.random((90, 6)) < 0.3).astype(np.uint8) * rng.integers(1, 3, (90, 6)).astype(np.uint8)
+    tiles[40:72] = 0
+    tile_map = TileMap(6, DEFAULT_PALETTE, rows=90, chunk_rows=8)
+    tile_map.fill_mask(0, np.ones((90, 6), dtype=bool), 0)
+    for type_num in (1, 2):
+        rows, cols = np.nonzero(tiles == type_num)
+        tile_map.set_cells(rows, cols, type_num)
+    return tile_map
+
+
+def check_undo_redo(history, tile_map, before, after):
+    assert np.array_equal(tile_map.to_array(), after)
+    assert history.undo()
+    assert np.array_equal(tile_map.to_array(), before)
+    assert history.redo()
+    assert np.array_equal(tile_map.to_array(), after)
+
+
+def test_stroke_undo_redo():
+    tile_map, history = make_map(), History()
+    before = tile_map.to_array()
+    deltas = []
+    for rows, cols, type_num in [([1, 2, 3], [0, 1, 2], 2), ([3, 4], [2, 3], 1), ([1, 80], [0, 5], 0)]:
+        rows, cols = np.array(rows), np.array(cols)
+        deltas.append(CellDelta.capture(tile_map, rows, cols, type_num))
+        tile_map.set_cells(rows, cols, type_num)
+    history.push(tile_map, CellDelta.combine(deltas))
+    check_undo_redo(history, tile_map, before, tile_map.to_array())
+
+
+def test_combine_keeps_first_old_and_last_new():
+    tile_map = TileMap(4, DEFAULT_PALETTE, rows=4)
+    tile_map.set(1, 1, 2)
+    first = CellDelta.capture(tile_map, np.array([1, 2]), np.array([1, 2]), 1)
+    tile_map.set_cells(np.array([1, 2]), np.array([1, 2]), 1)
+    second = CellDelta.capture(tile_map, np.array([1]), np.array([1]), 0)
+    combined = CellDelta.combine([first, second])
+    assert combined.flat.tolist() == [5, 10]
+    assert combined.old.tolist() == [2, 0]
+    assert combined.new.tolist() == [0, 1]
+
+
+def test_flood_fill_undo_redo():
+    tile_map, history = make_map(1), History()
+    before = tile_map.to_array()
+    run_rows, starts, ends, bands = flood_fill_chunks(tile_map, 50, 2)
+    assert len(bands)
+    delta = RunDelta(run_rows, starts, ends, 0, 2, bands, tile_map.cols)
+    history.push(tile_map, delta)
+    delta.apply(tile_map, undo=False)
+    after = tile_map.to_array()
+    assert len(delta) == int(((before == 0) & (after == 2)).sum())
+    check_undo_redo(history, tile_map, before, after)
+
+
+def test_rect_fill_undo_redo():
+    tile_map, history = make_map(2), History()
+    before = tile_map.to_array()
+    top, mask = runs_to_mask(*rect_runs((5, 1), (30, 4), (tile_map.rows, tile_map.cols)), tile_map.cols)
+    delta, changed = CellDelta.capture_mask(tile_map, top, mask, 1)
+    history.push(tile_map, delta)
+    tile_map.fill_mask(top, changed, 1)
+    assert len(delta) == int((before[5:31, 1:5] != 1).sum())
+    check_undo_redo(history, tile_map, before, tile_map.to_array())
+
+
+def test_clear_round_trips_runs():
+    tile_map, history = make_map(3), History()
+    before = tile_map.to_array()
+    delta = ClearDelta.capture(tile_map, 0)
+    assert len(delta) == int(np.count_nonzero(before))
+    assert len(delta.starts) < len(delta)
+    history.push(tile_map, delta)
+    tile_map.clear(0)
+    check_undo_redo(history, tile_map, before, np.zeros_like(before))
+
+
+def test_history_evicts_oldest_under_cap():
+    tile_map = TileMap(10, DEFAULT_PALETTE, rows=100)
+    deltas = [CellDelta.capture(tile_map, np.arange(20) + row, np.zeros(20, dtype=np.int64), 1) for row in (0, 30, 60)]
+    history = History(max_bytes=deltas[0].nbytes * 2)
+    for delta in deltas:
+        history.push(tile_map, delta)
+    assert [delta for _, delta in history.undo_stack] == deltas[1:]
+    assert history.nbytes == deltas[1].nbytes + deltas[2].nbytes
+    big = CellDelta.capture(tile_map, np.arange(100), np.zeros(100, dtype=np.int64), 2)
+    history.push(tile_map, big)
+    assert [delta for _, delta in history.undo_stack] == [big]
+    assert history.undo() and not history.undo()
+    assert history.nbytes == 0
+    history.push(tile_map, deltas[0])
+    assert not history.redo_stack
@@ -0,0 +1,67 @@
+import json
+import os
+import struct
+import sys
+
+import numpy as np
+import pytest
+
+from level_cli import convert_level, level_stats, main, run_job
+from level_format import DEFAULT_PALETTE, Level, LevelLayer, save_level
+
+
+def test_convert_refuses_to_drop_layers(tmp_path):
+    path = str(tmp_path / 'a.lvl')
+    tiles = np.ones((4, 3), dtype=np.uint8)
+    save_level(path, Level(None, DEFAULT_PALETTE, 20, 1500, [LevelLayer('base', tiles), LevelLayer('top', tiles)]))
+    result = convert_level(path, 1500, 1000, None, False)
+    assert result['problems']
+    assert not os.path.exists(str(tmp_path / 'a.txt'))
+
+
+def test_batch_reports_every_damaged_level(tmp_path, monkeypatch, capsys):
+    tiles = np.ones((40, 3), dtype=np.uint8)
+    for name in ('good', 'short', 'zlib'):
+        save_level(str(tmp_path / (name + '.lvl')), Level(tiles, DEFAULT_PALETTE, 20, 1500), compress=True)
+    with open(str(tmp_path / 'short.lvl'), 'r+b') as file:
+        file.truncate(10)
+    with open(str(tmp_path / 'zlib.lvl'), 'r+b') as file:
+        file.seek(-6, os.SEEK_END)
+        file.write(b'\xff' * 6)
+    monkeypatch.setattr(sys, 'argv', ['level_cli', '-j', '2', 'validate', str(tmp_path)])
+    with pytest.raises(SystemExit) as exit_info:
+        main()
+    assert exit_info.value.code == 1
+    lines = capsys.readouterr().out.splitlines()
+    results = {os.path.basename(result['path']): result for result in map(json.loads, lines)}
+    assert results['good.lvl']['ok']
+    assert not results['short.lvl']['ok'] and results['short.lvl']['error']
+    assert not results['zlib.lvl']['ok'] and results['zlib.lvl']['error']
+
+
+def test_unexpected_errors_become_failed_records():
+    def broken(path):
+        raise struct.error
+
+    assert run_job(broken, 'a.lvl') == {'path': 'a.lvl', 'ok': False, 'error': 'error'}
+
+
+def test_collision_export_keeps_only_solid_types(tmp_path, monkeypatch, capsys):
+    tiles = np.array([[1, 1, 2], [3, 3, 0]], dtype=np.uint8)
+    save_level(str(tmp_path / 'a.lvl'), Level(tiles, DEFAULT_PALETTE, 20, 1500))
+    monkeypatch.setattr(sys, 'argv', ['level_cli', '-j', '1', 'collision', '--solid', '1,3-4', str(tmp_path)])
+    with pytest.raises(SystemExit) as exit_info:
+        main()
+    assert exit_info.value.code == 0
+    assert json.loads(capsys.readouterr().out)['solid_tiles'] == 4
+
+
+def test_stats_cover_every_layer(tmp_path):
+    path = str(tmp_path / 'a.lvl')
+    base = np.zeros((4, 3), dtype=np.uint8)
+    top = np.array([[0, 2, 2], [0, 0, 0], [1, 0, 0], [1, 1, 0]], dtype=np.uint8)
+    save_level(path, Level(None, DEFAULT_PALETTE, 20, 1500, [LevelLayer('base', base), LevelLayer('top', top)]))
+    stats = level_stats(path, 1500, 1000, 4)
+    assert stats['layers']['base']['fill_ratio'] == 0.0 and stats['layers']['base']['regions'] == {}
+    assert stats['layers']['top']['histogram'][:3] == [7, 3, 2]
+    assert stats['layers']['top']['regions'] == {1: {'count': 1, 'largest': 3}, 2: {'count': 1, 'largest': 2}}
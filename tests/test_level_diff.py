@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from level_diff import apply_patch, diff_levels, load_patch, merge_levels, save_patch
+from level_format import DEFAULT_PALETTE, Level, LevelLayer
+
+
+def make_level(*layers):
+    return Level(None, DEFAULT_PALETTE, 20, 1500, [LevelLayer(name, tiles) for name, tiles in layers])
+
+
+def test_patch_round_trip(tmp_path):
+    path = str(tmp_path / 'a.tlpt')
+    rng = np.random.default_rng(0)
+    base = rng.integers(0, 3, (600, 5)).astype(np.uint8)
+    changed = np.zeros((700, 5), dtype=np.uint8)
+    changed[:600] = base
+    changed[[1, 300, 650]] = 2
+    top = rng.integers(0, 3, (10, 5)).astype(np.uint8)
+    old, new = make_level(('base', base)), make_level(('base', changed), ('top', top))
+    save_patch(path, diff_levels(old, new), 5)
+    diffs, cols = load_patch(path)
+    assert cols == 5
+    assert apply_patch(old, diffs) == []
+    assert [layer.name for layer in old.layers] == ['base', 'top']
+    assert np.array_equal(old.layers[0].tiles, changed)
+    assert np.array_equal(old.layers[1].tiles, top)
+
+
+def test_patch_reports_conflicts():
+    base = np.zeros((20, 4), dtype=np.uint8)
+    ours, target = base.copy(), base.copy()
+    ours[[2, 5], [1, 3]] = 1
+    target[5, 3] = 2
+    diffs = diff_levels(make_level(('base', base)), make_level(('base', ours)))
+    level = make_level(('base', target.copy()))
+    conflicts = apply_patch(level, diffs)
+    assert [layer.cells() for layer in conflicts] == [[[5, 3, 0, 2, 1]]]
+    assert level.tiles[2, 1] == 1 and level.tiles[5, 3] == 2
+    level = make_level(('base', target.copy()))
+    apply_patch(level, diffs, force=True)
+    assert np.array_equal(level.tiles, ours)
+
+
+@pytest.mark.parametrize('prefer', ['ours', 'theirs'])
+def test_merge_levels(prefer):
+    base = np.zeros((600, 4), dtype=np.uint8)
+    ours, theirs = base.copy(), base.copy()
+    ours[10, 0] = 1
+    theirs[500, 2] = 2
+    ours[300, 1], theirs[300, 1] = 1, 2
+    merged, conflicts = merge_levels(make_level(('base', base)), make_level(('base', ours)),
+                                     make_level(('base', theirs)), prefer=prefer)
+    assert [layer.cells() for layer in conflicts] == [[[300, 1, 0, 1, 2]]]
+    assert merged.tiles[10, 0] == 1 and merged.tiles[500, 2] == 2
+    assert merged.tiles[300, 1] == (1 if prefer == 'ours' else 2)
+
+
+def test_long_patch_layer_name_is_cut_on_a_character_boundary(tmp_path):
+    path = str(tmp_path / 'a.tlpt')
+    name = '\u00e9' * 200
+    old = Level(None, DEFAULT_PALETTE, 20, 1500, [LevelLayer(name, np.zeros((4, 3), dtype=np.uint8))])
+    new = Level(None, DEFAULT_PALETTE, 20, 1500, [LevelLayer(name, np.ones((4, 3), dtype=np.uint8))])
+    save_patch(path, diff_levels(old, new), 3)
+    diffs, cols = load_patch(path)
+    assert cols == 3
+    assert diffs[0].name == '\u00e9' * 127
@@ -0,0 +1,116 @@
+import os
+
+import numpy as np
+import pytest
+
+import level_format
+from level_format import (DEFAULT_PALETTE, Level, LevelLayer, append_journal, journal_path, load_level, save_level,
+                          save_level_atomic)
+
+
+def layered_level(rng):
+    palette = [[(index % 256, index // 256, 0), (0, 0, 0)] for index in range(300)]
+    base = rng.integers(0, 300, (50, 7)).astype(np.uint16)
+    top = rng.integers(0, 3, (80, 7)).astype(np.uint16)
+    return Level(None, palette, 20, 1500, [LevelLayer('base', base), LevelLayer('top', top, False, 100)])
+
+
+def test_layered_level_round_trip(tmp_path):
+    path = str(tmp_path / 'a.lvl')
+    level = layered_level(np.random.default_rng(0))
+    save_level(path, level)
+    loaded = load_level(path)
+    assert loaded.palette == level.palette
+    assert (loaded.grid, loaded.width) == (20, 1500)
+    assert [(layer.name, layer.visible, layer.opacity) for layer in loaded.layers] == \
+        [('base', True, 255), ('top', False, 100)]
+    for layer, expected in zip(loaded.layers, level.layers):
+        assert layer.tiles.dtype == np.uint16
+        assert np.array_equal(layer.tiles, expected.tiles)
+
+
+@pytest.mark.parametrize('compress', [False, True])
+@pytest.mark.parametrize('types', [3, 300])
+def test_level_round_trip(tmp_path, compress, types):
+    path = str(tmp_path / 'a.lvl')
+    palette = [[(index % 256, index // 256, 0), (0, 0, 0)] for index in range(types)]
+    tiles = np.random.default_rng(types).integers(0, types, (70, 9)).astype(np.uint8 if types <= 256 else np.uint16)
+    save_level(path, Level(tiles, palette, 20, 1500), compress, block_rows=16)
+    loaded = load_level(path)
+    assert loaded.palette == palette
+    assert (loaded.grid, loaded.width) == (20, 1500)
+    assert loaded.tiles.dtype == tiles.dtype
+    assert np.array_equal(loaded.tiles, tiles)
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_journal_replays_over_saved_layers(tmp_path, compress):
+    path = str(tmp_path / 'a.lvl')
+    level = layered_level(np.random.default_rng(1))
+    save_level(path, level, compress)
+    base, top = (layer.tiles.copy() for layer in level.layers)
+    base[[3, 40]] = 7
+    append_journal(path, 50, np.array([3, 40]), base[[3, 40]], 0)
+    grown = np.zeros((90, 7), dtype=np.uint16)
+    grown[:80] = top
+    grown[[0, 89]] = 2
+    append_journal(path, 90, np.array([0, 89]), grown[[0, 89]], 1)
+    loaded = load_level(path)
+    assert np.array_equal(loaded.layers[0].tiles, base)
+    assert np.array_equal(loaded.layers[1].tiles, grown)
+
+
+def test_atomic_save_syncs_before_dropping_the_journal(tmp_path, monkeypatch):
+    path = str(tmp_path / 'a.lvl')
+    tiles = np.ones((10, 4), dtype=np.uint8)
+    save_level_atomic(path, Level(tiles, DEFAULT_PALETTE, 20, 1500))
+    append_journal(path, 10, np.array([0]), np.zeros((1, 4), dtype=np.uint8))
+    events = []
+    real_fsync, real_replace, real_remove = os.fsync, os.replace, os.remove
+    monkeypatch.setattr(level_format.os, 'fsync', lambda fd: (events.append('fsync'), real_fsync(fd)))
+    monkeypatch.setattr(level_format.os, 'replace', lambda *args: (events.append('replace'), real_replace(*args)))
+    monkeypatch.setattr(level_format.os, 'remove', lambda name: (events.append('remove'), real_remove(name)))
+    save_level_atomic(path, Level(tiles * 2, DEFAULT_PALETTE, 20, 1500))
+    assert events == ['fsync', 'replace', 'fsync', 'remove']
+    assert not os.path.exists(journal_path(path))
+    assert (load_level(path).tiles == 2).all()
+
+
+def test_long_layer_name_is_cut_on_a_character_boundary(tmp_path):
+    path = str(tmp_path / 'a.lvl')
+    name = '\u00e9' * 200
+    tiles = np.ones((4, 3), dtype=np.uint8)
+    save_level(path, Level(None, DEFAULT_PALETTE, 20, 1500, [LevelLayer('base', tiles), LevelLayer(name, tiles)]))
+    loaded = load_level(path).layers[1].name
+    assert name.startswith(loaded)
+    assert len(loaded.encode('utf-8')) == 254
+
+
+def test_journal_skips_records_of_another_width(tmp_path):
+    path = str(tmp_path / 'a.lvl')
+    tiles = np.zeros((10, 4), dtype=np.uint8)
+    save_level(path, Level(tiles, DEFAULT_PALETTE, 20, 1500))
+    append_journal(path, 40, np.array([0, 39]), np.ones((2, 9), dtype=np.uint8))
+    append_journal(path, 10, np.array([2]), np.full((1, 4), 2, dtype=np.uint8))
+    loaded = load_level(path).tiles
+    tiles[2] = 2
+    assert np.array_equal(loaded, tiles)
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_damaged_levels_raise_value_error(tmp_path, compress):
+    path = str(tmp_path / 'a.lvl')
+    save_level(path, layered_level(np.random.default_rng(2)), compress)
+    with open(path, 'rb') as file:
+        data = file.read()
+    cuts = list(range(0, len(data), 97)) + [len(data) - 1]
+    damaged = [data[:cut] for cut in cuts] + [data[:-40] + bytes(40), data[:-80] + b'\xff' * 40 + data[-40:]]
+    for index, broken in enumerate(damaged):
+        with open(path, 'wb') as file:
+            file.write(broken)
+        try:
+            for layer in load_level(path).layers:
+                layer.tiles
+        except ValueError:
+            continue
+        assert not compress and index >= len(cuts)
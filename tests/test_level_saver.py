@@ -0,0 +1,76 @@
+import time
+
+import numpy as np
+
+import level_saver
+from layers import MapLayer
+from level_format import DEFAULT_PALETTE, load_level
+from level_saver import LevelSaver
+
+
+def wait(saver):
+    deadline = time.time() + 10
+    while saver.busy() and time.time() < deadline:
+        time.sleep(0.01)
+    assert not saver.busy()
+
+
+def make_layers():
+    layer = MapLayer('base', 6, DEFAULT_PALETTE, rows=20)
+    layer.tile_map.set_cells(np.arange(20), np.arange(20) % 6, 1)
+    return [layer]
+
+
+def test_worker_survives_unexpected_errors(tmp_path, monkeypatch):
+    layers = make_layers()
+    saver = LevelSaver()
+    real_save = level_saver.save_level_atomic
+
+    def broken_save(*args):
+        raise ValueError("boom")
+
+    monkeypatch.setattr(level_saver, 'save_level_atomic', broken_save)
+    saver.save(str(tmp_path / 'a.lvl'), layers, 20, 1500)
+    wait(saver)
+    assert saver.status == "Save failed: boom"
+    assert saver.failed
+    assert layers[0].tile_map.snapshots == 0
+
+    monkeypatch.setattr(level_saver, 'save_level_atomic', real_save)
+    saver.save(str(tmp_path / 'a.lvl'), layers, 20, 1500)
+    wait(saver)
+    saver.close()
+    assert not saver.failed
+    assert np.array_equal(load_level(str(tmp_path / 'a.lvl')).tiles, layers[0].tile_map.to_array())
+
+
+def test_journaled_autosave_marks_collision_stale(tmp_path):
+    path = str(tmp_path / 'a.lvl')
+    layers = make_layers()
+    saver = LevelSaver()
+    saver.save(path, layers, 20, 1500)
+    wait(saver)
+    layers[0].tile_map.set_cells(np.array([0]), np.array([5]), 1)
+    saver.autosave(path, layers, 20, 1500, {0: {0}})
+    wait(saver)
+    assert saver.status == "Saved a.lvl (collision stale)"
+    saver.save(path, layers, 20, 1500)
+    wait(saver)
+    saver.close()
+    assert saver.status == "Saved a.lvl"
+    assert not saver.stale_collision
+
+
+def test_first_autosave_of_a_session_is_a_full_save(tmp_path):
+    path = str(tmp_path / 'autosave.lvl')
+    first = LevelSaver()
+    first.autosave(path, make_layers(), 20, 1500, {})
+    wait(first)
+    first.close()
+    layer = MapLayer('base', 15, DEFAULT_PALETTE, rows=40)
+    layer.tile_map.set_cells(np.array([3]), np.array([14]), 2)
+    second = LevelSaver()
+    second.autosave(path, [layer], 50, 1500, {0: {3}})
+    wait(second)
+    second.close()
+    assert np.array_equal(load_level(path).tiles, layer.tile_map.to_array())
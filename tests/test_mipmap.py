@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from layers import MapLayer
+from mipmap import MipPyramid, downsample
+
+PALETTE = [[(200, 200, 200), (150, 150, 150)], [(255, 0, 0), (180, 0, 0)], [(0, 0, 255), (0, 0, 180)],
+           [(10, 250, 30), (5, 120, 15)]]
+
+
+def expected_levels(layers, depth):
+    pyramid = MipPyramid(layers, PALETTE)
+    image = pyramid.composite_range(0, pyramid.row_count())
+    levels = []
+    for _ in range(depth):
+        image = downsample(image, pyramid.empty_color())
+        levels.append(image)
+    return levels
+
+
+def check(pyramid, layers, depth):
+    for level, image in enumerate(expected_levels(layers, depth), 1):
+        assert np.array_equal(pyramid.image(level, 0, image.shape[0]), image)
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_paged_pyramid_tracks_edits(seed):
+    rng = np.random.default_rng(seed)
+    layers = [MapLayer('base', 7, PALETTE, rows=300), MapLayer('top', 7, PALETTE, rows=300)]
+    for layer in layers:
+        layer.tile_map.chunk_rows = 16
+        layer.tile_map.empty = np.zeros((16, 7), dtype=np.uint8)
+    layers[0].tile_map.set_cells(rng.integers(0, 120, 200), rng.integers(0, 7, 200), rng.integers(1, 4, 200))
+    pyramid = MipPyramid(layers, PALETTE, block_rows=16, memory_budget=600)
+    check(pyramid, layers, 6)
+    for step in range(40):
+        tile_map = layers[rng.integers(0, 2)].tile_map
+        action = rng.integers(0, 6)
+        if action == 0:
+            count = rng.integers(1, 5)
+            tile_map.set_cells(rng.integers(0, tile_map.rows, count), rng.integers(0, 7, count), rng.integers(0, 4))
+        elif action == 1:
+            start = int(rng.integers(0, tile_map.rows - 1))
+            tile_map.fill_rows(start, min(start + int(rng.integers(1, 90)), tile_map.rows), int(rng.integers(0, 4)))
+        elif action == 2:
+            top = int(rng.integers(0, tile_map.rows - 10))
+            tile_map.fill_mask(top, rng.random((10, 7)) < 0.5, int(rng.integers(0, 4)))
+        elif action == 3:
+            tile_map.clear(int(rng.integers(0, 2)))
+        elif action == 4:
+            for layer in layers:
+                layer.add_rows(int(rng.integers(1, 40)))
+        else:
+            layers[1].visible = not layers[1].visible
+            pyramid.sync_layers()
+        check(pyramid, layers, 6)
+
+
+def test_empty_blocks_are_not_stored():
+    layer = MapLayer('base', 30, PALETTE, rows=200000)
+    layer.tile_map.set_cells(np.array([150000]), np.array([3]), 2)
+    pyramid = MipPyramid([layer], PALETTE)
+    rows = -(-200000 // 2 ** 10)
+    image = pyramid.image(10, 0, rows)
+    assert (image != pyramid.empty_color()).any(axis=-1).sum() == 1
+    stored = [block for block in pyramid.blocks.values() if block is not None]
+    assert len(stored) == 10
+    layer.tile_map.clear(0)
+    assert (pyramid.image(10, 0, rows) == pyramid.empty_color()).all()
+    assert all(block is None for block in pyramid.blocks.values())
+
+
+def test_prepare_spreads_the_build_over_frames():
+    layer = MapLayer('base', 8, PALETTE, rows=4000)
+    layer.tile_map.fill_rows(0, 4000, 1)
+    pyramid = MipPyramid([layer], PALETTE, block_rows=32)
+    assert not pyramid.prepare(8, 0, 16, deadline=0)
+    calls = 1
+    while not pyramid.prepare(8, 0, 16, deadline=0):
+        calls += 1
+    assert calls > 1
+    check(pyramid, [layer], 8)
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from history import RunDelta
+from level_format import DEFAULT_PALETTE
+from regions import flood_fill_chunks, flood_fill_runs, runs_to_mask
+from tile_map import TileMap
+
+
+def region_mask(shape, run_rows, starts, ends, bands=()):
+    mask = np.zeros(shape, dtype=bool)
+    if len(run_rows):
+        top, runs = runs_to_mask(run_rows, starts, ends, shape[1])
+        mask[top:top + len(runs)] |= runs
+    for start, stop in bands:
+        mask[start:stop] = True
+    return mask
+
+
+def random_map(rng):
+    cols, rows, chunk_rows = int(rng.integers(1, 12)), int(rng.integers(1, 200)), 8 * int(rng.integers(1, 4))
+    tile_map = TileMap(cols, DEFAULT_PALETTE, rows=rows, chunk_rows=chunk_rows, memory_budget=chunk_rows * cols * 3)
+    for chunk in range(tile_map.chunk_count()):
+        if rng.random() < 0.5:
+            start = chunk * chunk_rows
+            count = min(chunk_rows, rows - start)
+            rows_index, cols_index = np.repeat(np.arange(start, start + count), cols), np.tile(np.arange(cols), count)
+            values = (rng.random(rows_index.size) < rng.random() * 0.7) * rng.integers(1, 3, rows_index.size)
+            tile_map.set_cells(rows_index, cols_index, values)
+    return tile_map
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_chunked_fill_matches_whole_array_fill(seed):
+    rng = np.random.default_rng(seed)
+    tile_map = random_map(rng)
+    tiles = tile_map.to_array()
+    row, col = int(rng.integers(0, tile_map.rows)), int(rng.integers(0, tile_map.cols))
+    connectivity = int(rng.choice([4, 8]))
+    expected = region_mask(tiles.shape, *flood_fill_runs(tiles, row, col, connectivity))
+    run_rows, starts, ends, bands = flood_fill_chunks(tile_map, row, col, connectivity)
+    assert np.array_equal(region_mask(tiles.shape, run_rows, starts, ends, bands), expected)
+
+    old = int(tiles[row, col])
+    delta = RunDelta(run_rows, starts, ends, old, (old + 1) % 3, bands, tile_map.cols, window_rows=16)
+    assert len(delta) == expected.sum()
+    delta.apply(tile_map, undo=False)
+    filled = tiles.copy()
+    filled[expected] = (old + 1) % 3
+    assert np.array_equal(tile_map.to_array(), filled)
+    delta.apply(tile_map, undo=True)
+    assert np.array_equal(tile_map.to_array(), tiles)
+
+
+def test_fill_of_empty_tail_stores_nothing():
+    tile_map = TileMap(30, DEFAULT_PALETTE, rows=100000)
+    tile_map.set(5, 5, 1)
+    run_rows, starts, ends, bands = flood_fill_chunks(tile_map, 50000, 0)
+    assert bands.tolist() == [[256, 100000]]
+    assert run_rows.max() < 256
+    assert list(tile_map.resident) == [0]
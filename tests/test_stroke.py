@@ -0,0 +1,48 @@
+import numpy as np
+
+from stroke import Stroke, line_cells
+
+
+def test_line_cells_are_gap_free():
+    for end in [(7, 3), (-5, 9), (2, -8), (-6, -6), (0, 4), (9, 0)]:
+        rows, cols = line_cells((1, 2), (1 + end[0], 2 + end[1]))
+        assert (rows[0], cols[0]) == (1, 2)
+        assert (rows[-1], cols[-1]) == (1 + end[0], 2 + end[1])
+        assert len(rows) == max(abs(end[0]), abs(end[1])) + 1
+        assert (np.abs(np.diff(rows)) <= 1).all() and (np.abs(np.diff(cols)) <= 1).all()
+
+
+def test_single_point_line():
+    rows, cols = line_cells((4, 5), (4, 5))
+    assert rows.tolist() == [4] and cols.tolist() == [5]
+
+
+def test_rasterize_joins_points_and_breaks_on_none():
+    stroke = Stroke()
+    for cell in [(0, 0), (0, 3), None, (5, 5), (5, 5)]:
+        stroke.add(cell)
+    rows, cols = stroke.rasterize(10, 10)
+    assert list(zip(rows.tolist(), cols.tolist())) == [(0, 0), (0, 1), (0, 2), (0, 3), (5, 5)]
+
+
+def test_rasterize_continues_from_the_last_batch():
+    stroke = Stroke()
+    stroke.add((2, 2))
+    stroke.rasterize(10, 10)
+    stroke.add((2, 5))
+    rows, cols = stroke.rasterize(10, 10)
+    assert list(zip(rows.tolist(), cols.tolist())) == [(2, 2), (2, 3), (2, 4), (2, 5)]
+    stroke.end()
+    stroke.add((4, 4))
+    rows, cols = stroke.rasterize(10, 10)
+    assert list(zip(rows.tolist(), cols.tolist())) == [(4, 4)]
+
+
+def test_rasterize_clips_to_bounds():
+    stroke = Stroke()
+    stroke.add((-2, -2))
+    stroke.add((3, 3))
+    stroke.add((3, 12))
+    rows, cols = stroke.rasterize(5, 6)
+    assert ((rows >= 0) & (rows < 5) & (cols >= 0) & (cols < 6)).all()
+    assert list(zip(rows.tolist(), cols.tolist())) == [(0, 0), (1, 1), (2, 2), (3, 3), (3, 4), (3, 5)]
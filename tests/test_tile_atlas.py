@@ -0,0 +1,31 @@
+import json
+
+import pygame as pg
+import pytest
+
+from tile_atlas import TileAtlas
+
+
+def write_atlas(folder, tiles):
+    pg.image.save(pg.Surface((32, 16)), str(folder / 'tiles.png'))
+    path = folder / 'tiles.json'
+    path.write_text(json.dumps({'image': 'tiles.png', 'tile_size': 16, 'tiles': tiles}))
+    return str(path)
+
+
+@pytest.mark.parametrize('color', [[255, 0, 0, 255], [256, 0, 0], [1.5, 0, 0], "red"])
+def test_bad_colors_name_the_tile(tmp_path, color):
+    path = write_atlas(tmp_path, [{'col': 0, 'row': 0}, {'col': 1, 'row': 0, 'selected_color': color}])
+    with pytest.raises(ValueError, match="tile 1 selected_color"):
+        TileAtlas.load(path)
+
+
+def test_colors_default_from_tiles(tmp_path):
+    atlas = TileAtlas.load(write_atlas(tmp_path, [{'col': 0, 'row': 0, 'color': [10, 20, 30]}, {'col': 1, 'row': 0}]))
+    assert atlas.palette == [[(10, 20, 30), (7, 14, 21)], [(0, 0, 0), (0, 0, 0)]]
+
+
+def test_solid_flag_picks_collision_types(tmp_path):
+    atlas = TileAtlas.load(write_atlas(tmp_path, [{'col': 0, 'row': 0}, {'col': 1, 'row': 0, 'solid': False},
+                                                  {'col': 0, 'row': 0, 'solid': True}]))
+    assert atlas.solid == [2]
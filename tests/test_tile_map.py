@@ -0,0 +1,24 @@
+import numpy as np
+
+from level_format import DEFAULT_PALETTE
+from tile_map import TileMap
+
+
+def test_clear_leaves_rows_past_the_end_empty():
+    tile_map = TileMap(4, DEFAULT_PALETTE, rows=38, chunk_rows=8)
+    tile_map.clear(2)
+    tile_map.add_rows(6)
+    tiles = tile_map.to_array()
+    assert (tiles[:38] == 2).all()
+    assert not tiles[38:].any()
+
+
+def test_snapshot_keeps_contents_while_parent_pages():
+    tile_map = TileMap(4, DEFAULT_PALETTE, rows=64, chunk_rows=8, memory_budget=8 * 4 * 2)
+    tile_map.set_cells(np.arange(64), np.arange(64) % 4, 1)
+    snapshot = tile_map.snapshot()
+    expected = tile_map.to_array()
+    tile_map.set_cells(np.arange(64), np.zeros(64, dtype=np.int64), 2)
+    assert np.array_equal(snapshot.to_array(), expected)
+    assert (tile_map.to_array()[:, 0] == 2).all()
+    snapshot.release()
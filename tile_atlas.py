@@ -0,0 +1,86 @@
+import json
+import os
+
+import pygame as pg
+
+from grid_renderer import draw_tile
+
+VARIANTS = ('normal', 'selected', 'hover')
+
+
+def darken(color, factor=0.7):
+    return tuple(int(channel * factor) for channel in color[:3])
+
+
+def prepare(surface):
+    if pg.display.get_surface() is None:
+        return surface
+    return surface.convert_alpha() if surface.get_flags() & pg.SRCALPHA else surface.convert()
+
+
+def entry_color(entry, key, index, default):
+    if key not in entry:
+        return tuple(default)
+    color = entry[key]
+    if not isinstance(color, list) or len(color) != 3 or \
+            not all(isinstance(channel, int) and not isinstance(channel, bool) and 0 <= channel <= 255
+                    for channel in color):
+        raise ValueError("tile " + str(index) + " " + key + " must be three integers from 0 to 255")
+    return tuple(color)
+
+
+class TileAtlas:
+
+    def __init__(self, palette, sources=None, solid=None):
+        self.palette = palette
+        self.sources = sources
+        self.solid = solid
+        self.scaled = {}
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as file:
+            descriptor = json.load(file)
+        image = pg.image.load(os.path.join(os.path.dirname(path), descriptor['image']))
+        tile_width, tile_height = (descriptor['tile_size'] if isinstance(descriptor['tile_size'], list)
+                                   else (descriptor['tile_size'],) * 2)
+        entries = descriptor.get('tiles')
+        if entries is None:
+            columns, rows = image.get_width() // tile_width, image.get_height() // tile_height
+            entries = [{'col': index % columns, 'row': index // columns} for index in range(columns * rows)]
+        sources, palette = [], []
+        for entry in entries:
+            rect = pg.Rect(entry['col'] * tile_width, entry['row'] * tile_height, tile_width, tile_height)
+            if not image.get_rect().contains(rect):
+                raise ValueError("tile " + str(len(sources)) + " lies outside the tileset image")
+            source = image.subsurface(rect).copy()
+            color = entry_color(entry, 'color', len(sources), pg.transform.average_color(source)[:3])
+            palette.append([color, entry_color(entry, 'selected_color', len(sources), darken(color))])
+            sources.append(source)
+        if not sources:
+            raise ValueError("tileset has no tiles")
+        solid = [index for index, entry in enumerate(entries) if entry.get('solid', index > 0)]
+        return cls(palette, sources, solid)
+
+    def render_variants(self, type_num, size):
+        color, selected_color = self.palette[type_num]
+        if self.sources is None:
+            normal, selected = pg.Surface(size), pg.Surface(size)
+            draw_tile(normal, normal.get_rect(), color)
+            draw_tile(selected, selected.get_rect(), selected_color)
+            normal, selected = prepare(normal), prepare(selected)
+        else:
+            normal = prepare(pg.transform.scale(self.sources[type_num], size))
+            selected = normal.copy()
+            selected.fill(darken((255, 255, 255)), special_flags=pg.BLEND_RGB_MULT)
+        hover = normal.copy()
+        hover.fill((40, 40, 40), special_flags=pg.BLEND_RGB_ADD)
+        return {'normal': normal, 'selected': selected, 'hover': hover}
+
+    def images(self, side, variant='normal'):
+        size = (max(int(side), 1), max(int(side), 1))
+        variants = self.scaled.get(size)
+        if variants is None:
+            tiles = [self.render_variants(type_num, size) for type_num in range(len(self.palette))]
+            variants = self.scaled[size] = {name: [tile[name] for tile in tiles] for name in VARIANTS}
+        return variants[variant]
@@ -1,202 +1,620 @@
+import argparse
+import math
+from functools import partial
+
+import numpy as np
 import pygame as pg
+from camera import Camera
 from dialog_box import DialogBox
+from frame_scheduler import FrameScheduler
+from grid_renderer import LayeredRenderer
+from history import CellDelta, ClearDelta, History, RunDelta
+from layers import MapLayer
+from level_diff import ChangeTracker
+from level_format import DEFAULT_PALETTE, load_level
+from level_saver import LevelSaver
+from mipmap import Minimap, MipPyramid, MipRenderer
+from regions import flood_fill_chunks, rect_runs, runs_to_mask
+from stroke import Stroke
+from tile_atlas import TileAtlas
+from tile_map import TileMap
 
-
-class Tile:
-
-    def __init__(self, screen_width, screen_height, grid, pos, color=(200, 200, 200)):
-        self.rect = pg.Rect(pos, (screen_height / grid, screen_height / grid))
-        self.color = color
-        self.type = 0
-
-    def get_type(self):
-        return self.type
-
-    def update_pos(self, movement):
-        self.rect.y -= movement
-
-    def update_color(self, color):
-        self.color = color
-
-    def update_type(self, color, type_num):
-        self.color = color
-        self.type = type_num
-
-    def draw(self, screen, is_selected=False):
-        edge = 2
-        if is_selected:
-            pg.draw.rect(screen, (0, 0, 0), self.rect)
-            pg.draw.rect(screen, self.color,
-                         (self.rect.x + edge, self.rect.y + edge, self.rect.width - 2 * edge,
-                          self.rect.height - 2 * edge))
-            return
-        pg.draw.rect(screen, (0, 0, 0), self.rect)
-        pg.draw.rect(screen, self.color,
-                     (self.rect.x + edge, self.rect.y + edge, self.rect.width - 2 * edge, self.rect.height - 2 * edge))
+AUTOSAVE_EVENT = pg.USEREVENT + 1
+MENU_STATUS_WIDTH = 300
+MINIMAP_WIDTH = 120
+MAX_ZOOM = 16
 
 
 class TileEditor:
 
-    def __init__(self):
+    def __init__(self, autosave_interval=60, atlas_path=None):
         self.running = True
         self.width, self.height = 1500, 1000
         self.screen = pg.display.set_mode((self.width, self.height))
         self.dialog_box = DialogBox(self.width, self.height, "Grid size (divisible by " + str(self.width) + ")")
         self.grid = 20
-        self.types = [[(200, 200, 200), (150, 150, 150)],
-                      [(255, 0, 0), (180, 0, 0)],
-                      [(0, 0, 255), (0, 0, 180)]]
+        self.atlas = TileAtlas.load(atlas_path) if atlas_path else TileAtlas(list(DEFAULT_PALETTE))
+        self.types = self.atlas.palette
         self.square_side = 0
-        self.sample_tiles = []
-        self.filled_tiles = []
+        self.menu_left = 0
+        self.menu_page = 0
+        self.menu_page_size = 1
+        self.menu_slots = []
+        self.menu_dirty = False
+        self.hover_type = None
+        self.stroke = Stroke()
+        self.stroke_deltas = []
+        self.history = History()
+        self.tool = 'paint'
+        self.selection = None
+        self.selection_rect = None
         self.selected_type = 0
         self.scrolling_down = False
         self.scrolling_up = False
         self.clicked = False
-        self.on_screen = [0, 0]
-        self.scroll = 0
+        self.camera = Camera(self.width, 0)
         self.pos_mouse_var = (0, 0)
         self.num_tiles = 0
-        self.max_scroll = 0
-        self.tiles = []
-
-    def run(self):
-        self.dialog_box.run(self.screen)
-        self.end_box()
-        while self.running:
-            pg.time.Clock().tick(60)
-            self.handle_events()
-            self.scroll_screen()
-            self.draw()
+        self.tile_map = TileMap(0, self.types)
+        self.layers = []
+        self.active_layer = 0
+        self.renderer = None
+        self.zoom = 0
+        self.pyramid = None
+        self.mip_renderer = None
+        self.minimap = None
+        self.show_minimap = False
+        self.minimap_drag = False
+        self.changes = None
+        self.message = ""
+        self.screen_dirty = True
+        self.saver = LevelSaver(solid=self.atlas.solid)
+        self.save_path = None
+        self.unsaved_rows = {}
+        self.autosave_interval = autosave_interval
+        self.status_font = pg.font.SysFont('Arial', 20)
+        self.drawn_status = None
+        self.scheduler = FrameScheduler(fps=60)
+        self.profiler = self.scheduler.profiler
+        self.show_profile = False
+        self.profile_rect = None
+
+    def run(self, path=None):
+        if path is None:
+            self.dialog_box.run(self.screen)
+            self.end_box()
+        else:
+            self.load_from_file(path)
+        if self.autosave_interval:
+            pg.time.set_timer(AUTOSAVE_EVENT, int(self.autosave_interval * 1000))
+        self.scheduler.run(lambda: self.running, self.handle_events, self.scroll_screen, self.draw, self.is_busy)
+        pg.time.set_timer(AUTOSAVE_EVENT, 0)
+        self.saver.close()
+
+    def is_busy(self):
+        return (self.scrolling_down or self.scrolling_up or self.clicked or self.saver.busy() or
+                self.show_minimap and self.minimap.building())
 
     def end_box(self):
         answer = self.dialog_box.get_answers([int])[0]
         if answer is not None:
             self.grid = answer
+        self.setup_grid()
+
+    def setup_grid(self, level_layers=None):
         self.square_side = self.height / self.grid
-        self.sample_tiles = [Tile(self.width, self.height, self.grid,
-                                  ((idx + 1) * self.width / (len(self.types) + 1) - self.square_side / 2,
-                                   self.height - self.square_side), color=typ[0])
-                             for idx, typ in enumerate(self.types)]
-        self.tiles = [[Tile(self.width, self.height, self.grid, (i * self.square_side, j * self.square_side))
-                       for i in range(int(self.width/self.square_side))]
-                      for j in range(self.grid - 1)]
-        self.on_screen[1] = self.grid - 1
-        self.max_scroll = self.on_screen[1]
+        capacity = max(int((self.width - MENU_STATUS_WIDTH) // (self.square_side * 1.25)), 1)
+        self.menu_left = 0 if len(self.types) <= capacity else MENU_STATUS_WIDTH
+        self.menu_page_size = min(len(self.types), capacity)
+        self.set_menu_page(0)
+        if level_layers is None:
+            self.layers = [MapLayer('base', int(self.width/self.square_side), self.types, rows=self.grid - 1)]
+        else:
+            self.layers = [MapLayer.from_level_layer(layer, self.types, self.grid - 1) for layer in level_layers]
+            self.grow_rows(max(layer.row_count() for layer in self.layers))
+        for index, layer in enumerate(self.layers):
+            layer.add_listener(partial(self.on_cells_changed, index))
+        self.active_layer = 0
+        self.tile_map = self.layers[0].tile_map
+        self.camera = Camera(self.width, (self.grid - 1) * self.square_side)
+        self.renderer = LayeredRenderer(self.layers, self.atlas, self.square_side, self.width,
+                                        int(self.camera.view_height))
+        self.pyramid = MipPyramid(self.layers, self.types)
+        self.mip_renderer = MipRenderer(self.pyramid, self.square_side, self.width, int(self.camera.view_height))
+        self.minimap = Minimap(self.pyramid, (self.width - MINIMAP_WIDTH, 0, MINIMAP_WIDTH,
+                                              int(self.camera.view_height)), self.square_side)
+        self.zoom = 0
+        self.changes = None
+        self.unsaved_rows = {}
+        self.history.clear()
+        self.screen_dirty = True
+
+    def menu_x(self, slot):
+        return self.menu_left + (slot + 1) * (self.width - self.menu_left) / (self.menu_page_size + 1)
+
+    def set_menu_page(self, page):
+        pages = -(-len(self.types) // self.menu_page_size)
+        self.menu_page = min(max(page, 0), pages - 1)
+        first = self.menu_page * self.menu_page_size
+        self.menu_slots = [(type_num, pg.Rect(self.menu_x(slot) - self.square_side / 2, self.height - self.square_side,
+                                              self.square_side, self.square_side))
+                           for slot, type_num in enumerate(range(first, min(first + self.menu_page_size,
+                                                                            len(self.types))))]
+        self.menu_dirty = True
+
+    def menu_type_at(self, pos):
+        for type_num, rect in self.menu_slots:
+            if rect.collidepoint(pos):
+                return type_num
+        return None
 
     def create_new_line(self):
-        self.tiles.append([Tile(self.width, self.height,
-                                self.grid, (i * self.square_side, (self.grid - 1) * self.square_side))
-                           for i in range(int(self.width/self.square_side))])
+        self.grow_rows(self.tile_map.rows + 1)
+
+    def grow_rows(self, rows):
+        for layer in self.layers:
+            if layer.row_count() < rows:
+                layer.add_rows(rows - layer.row_count())
+
+    def select_layer(self, index):
+        if index >= len(self.layers) or index == self.active_layer:
+            return
+        self.commit_stroke()
+        self.active_layer = index
+        self.tile_map = self.layers[index].tile_map
+        self.drawn_status = None
+
+    def add_layer(self):
+        answers = DialogBox(self.width, self.height, "Layer name").run_and_return_answers(self.screen, [str])
+        self.screen_dirty = True
+        if answers is None:
+            return
+        layer = MapLayer(answers[0] or "layer " + str(len(self.layers) + 1), self.tile_map.cols, self.types,
+                         rows=self.tile_map.rows)
+        layer.add_listener(partial(self.on_cells_changed, len(self.layers)))
+        self.layers.append(layer)
+        self.layers_changed()
+        self.select_layer(len(self.layers) - 1)
+
+    def toggle_layer(self):
+        layer = self.layers[self.active_layer]
+        layer.visible = not layer.visible
+        self.layers_changed()
+
+    def change_opacity(self, step):
+        layer = self.layers[self.active_layer]
+        layer.opacity = min(max(layer.opacity + step, 0), 255)
+        self.layers_changed()
+
+    def layers_changed(self):
+        self.renderer.sync_layers()
+        self.pyramid.sync_layers()
+        if self.changes is not None:
+            self.changes.sync_layers()
+        self.unsaved_rows = None
+        self.drawn_status = None
+
+    def apply_stroke(self):
+        rows, cols = self.stroke.rasterize(self.tile_map.rows, self.tile_map.cols)
+        if len(rows):
+            self.stroke_deltas.append(CellDelta.capture(self.tile_map, rows, cols, self.selected_type))
+            self.tile_map.set_cells(rows, cols, self.selected_type)
+
+    def commit_stroke(self):
+        self.apply_stroke()
+        self.stroke.end()
+        if self.stroke_deltas:
+            self.history.push(self.tile_map, CellDelta.combine(self.stroke_deltas))
+            self.stroke_deltas = []
+
+    def undo(self):
+        self.commit_stroke()
+        self.history.undo()
+
+    def redo(self):
+        self.commit_stroke()
+        self.history.redo()
 
     def scroll_screen(self):
-        if self.scroll >= self.square_side or self.scroll <= -self.square_side:
-            self.on_screen[0] += int(self.scroll/self.square_side)
-            self.on_screen[1] += int(self.scroll/self.square_side)
-            if self.on_screen[1] > self.max_scroll:
-                self.max_scroll = self.on_screen[1]
-                self.create_new_line()
-            for line in self.tiles:
-                for tile in line:
-                    tile.update_pos(self.scroll)
-            self.scroll = 0
         if self.scrolling_down:
-            self.scroll += self.square_side / 5
+            self.camera.move(self.square_side / 5 * 2 ** self.zoom)
         elif self.scrolling_up:
-            if self.on_screen[0] > 0:
-                self.scroll -= self.square_side / 5
+            self.camera.move(-self.square_side / 5 * 2 ** self.zoom)
+        if self.zoom:
+            self.camera.jump_to(min(self.camera.y, self.tile_map.rows * self.square_side))
+            return
+        last_row = self.camera.visible_rows(self.square_side)[1]
+        if last_row > self.tile_map.rows:
+            self.grow_rows(last_row)
+
+    def max_zoom(self):
+        view_rows = self.camera.view_height / self.square_side
+        return min(max(math.ceil(math.log2(max(self.tile_map.rows / view_rows, 1))), 1), MAX_ZOOM)
+
+    def zoom_at(self, pos, steps):
+        zoom = min(max(self.zoom - steps, 0), self.max_zoom())
+        if zoom == self.zoom:
+            return
+        row = (self.camera.y + pos[1] * 2 ** self.zoom) / self.square_side
+        self.zoom = zoom
+        self.camera.jump_to(row * self.square_side - pos[1] * 2 ** zoom)
+        self.mip_renderer.drawn_state = None
+        self.renderer.full_redraw = True
+
+    def jump_to_row(self, row):
+        self.camera.jump_to(row * self.square_side - self.camera.view_height * 2 ** self.zoom / 2)
+
+    def toggle_minimap(self):
+        self.show_minimap = not self.show_minimap
+        self.screen_dirty = True
+
+    def compare_with_file(self):
+        self.screen_dirty = True
+        if self.changes is not None:
+            self.changes.close()
+            self.changes = None
+            self.drawn_status = None
+            return
+        answers = DialogBox(self.width, self.height, "Compare with file").run_and_return_answers(self.screen, [str])
+        if answers is None:
+            return
+        path = answers[0] or self.save_path
+        if not path:
+            return
+        self.drawn_status = None
+        try:
+            reference = load_level(path, legacy_palette=self.types)
+            if any(layer.shape[1] != self.tile_map.cols for layer in reference.layers):
+                self.message = "Compare failed: level width differs"
+                return
+            self.changes = ChangeTracker(reference.layers, self.layers)
+            self.message = ""
+        except (OSError, ValueError) as error:
+            self.message = "Compare failed: " + str(error)
+
+    def jump_to_change(self):
+        if self.changes is None:
+            return
+        self.changes.refresh()
+        center = (self.camera.y + self.camera.view_height * 2 ** self.zoom / 2) / self.square_side
+        row = self.changes.next_row(int(center) + 1)
+        if row is None:
+            row = self.changes.next_row(0)
+        if row is not None:
+            self.jump_to_row(row + 0.5)
 
     def handle_mouse_click(self, event):
+        if event.button != 1:
+            return
+        if self.show_minimap and self.minimap.rect.collidepoint(event.pos):
+            self.minimap_drag = True
+            self.jump_to_row(self.minimap.row_at(event.pos))
+            return
+        if self.zoom and event.pos[1] < self.camera.view_height:
+            self.zoom_at(event.pos, self.zoom)
+            return
         self.clicked = True
-        sample_pressed = False
-        for idx, tile in enumerate(self.sample_tiles):
-            if tile.rect.collidepoint(event.pos):
-                self.selected_type = idx
-                tile.update_color(self.types[idx][1])
-                sample_pressed = True
-        if sample_pressed:
-            for idx, tile in enumerate(self.sample_tiles):
-                if idx != self.selected_type:
-                    tile.update_color(self.types[idx][0])
-        for line in self.tiles:
-            for tile in line:
-                if tile.rect.collidepoint(event.pos):
-                    tile.update_type(self.types[self.selected_type][0], self.selected_type)
-                    self.filled_tiles.append(tile)
-
-    def handle_mouse_up(self):
+        type_num = self.menu_type_at(event.pos)
+        if type_num is not None:
+            self.selected_type = type_num
+            self.menu_dirty = True
+        if self.tool == 'paint':
+            self.stroke.end()
+            self.stroke.add(self.cell_coords(event.pos))
+            return
+        cell = self.cell_at(event.pos)
+        if cell is None:
+            return
+        if self.tool in ('fill', 'fill8'):
+            self.flood_fill(cell, 8 if self.tool == 'fill8' else 4)
+        else:
+            self.selection = [cell, cell]
+
+    def cell_coords(self, pos):
+        if pos[1] >= self.camera.view_height or self.show_minimap and self.minimap.rect.collidepoint(pos):
+            return None
+        x, y = self.camera.to_world(pos)
+        return int(y // self.square_side), int(x // self.square_side)
+
+    def cell_at(self, pos):
+        if pos[0] < 0 or pos[1] < 0:
+            return None
+        cell = self.cell_coords(pos)
+        if cell is None or cell[0] >= self.tile_map.rows or cell[1] >= self.tile_map.cols:
+            return None
+        return cell
+
+    def handle_mouse_up(self, event):
+        if event.button != 1:
+            return
+        self.commit_stroke()
+        if self.selection is not None:
+            self.fill_rect(*self.selection, self.selected_type if self.tool == 'rect' else 0)
+            self.selection = None
         self.clicked = False
+        self.minimap_drag = False
 
     def handle_mouse_motion(self, event):
-        if self.clicked:
-            for line in self.tiles:
-                for tile in line:
-                    if tile.rect.collidepoint(event.pos):
-                        tile.update_type(self.types[self.selected_type][0], self.selected_type)
-                        self.filled_tiles.append(tile)
+        hover_type = self.menu_type_at(event.pos)
+        if hover_type != self.hover_type:
+            self.hover_type = hover_type
+            self.menu_dirty = True
+        if self.minimap_drag:
+            self.jump_to_row(self.minimap.row_at(event.pos))
+        elif self.clicked and self.tool == 'paint':
+            self.stroke.add(self.cell_coords(event.pos))
+        elif self.clicked and self.selection is not None:
+            cell = self.cell_coords(event.pos)
+            if cell is not None:
+                self.selection[1] = cell
+
+    def flood_fill(self, cell, connectivity=4):
+        self.commit_stroke()
+        old = self.tile_map.get(*cell)
+        if old == self.selected_type:
+            return
+        run_rows, starts, ends, bands = flood_fill_chunks(self.tile_map, cell[0], cell[1], connectivity)
+        delta = RunDelta(run_rows, starts, ends, old, self.selected_type, bands, self.tile_map.cols)
+        self.history.push(self.tile_map, delta)
+        delta.apply(self.tile_map, undo=False)
+
+    def fill_rect(self, start, end, type_num):
+        self.commit_stroke()
+        runs = rect_runs(start, end, (self.tile_map.rows, self.tile_map.cols))
+        if not len(runs[0]):
+            return
+        top, mask = runs_to_mask(*runs, self.tile_map.cols)
+        delta, changed = CellDelta.capture_mask(self.tile_map, top, mask, type_num)
+        self.history.push(self.tile_map, delta)
+        self.tile_map.fill_mask(top, changed, type_num)
+
+    def select_tool(self, key):
+        tools = {pg.K_p: 'paint', pg.K_f: 'fill', pg.K_g: 'fill8', pg.K_b: 'rect', pg.K_x: 'clear'}
+        if key in tools:
+            self.commit_stroke()
+            self.tool = tools[key]
 
     def handle_scroll(self, event):
         if event.key == pg.K_DOWN:
-            if self.scrolling_down:
-                self.scroll = self.height / self.grid
-            self.scrolling_down = not self.scrolling_down
+            self.scrolling_down = event.type == pg.KEYDOWN
         if event.key == pg.K_UP:
-            if self.scrolling_up:
-                if self.on_screen[0] > 0:
-                    self.scroll = -self.height / self.grid
-            self.scrolling_up = not self.scrolling_up
+            self.scrolling_up = event.type == pg.KEYDOWN
 
     def erase_all(self):
-        for idx, line in enumerate(self.tiles):
-            for tile in line:
-                tile.update_type(self.types[0][0], 0)
-                self.filled_tiles = []
+        self.commit_stroke()
+        self.history.push(self.tile_map, ClearDelta.capture(self.tile_map, 0))
+        self.tile_map.clear(0)
+
+    def on_cells_changed(self, index, rows, cols):
+        if rows is None or rows.size > self.saver.compact_ratio * self.layers[index].row_count():
+            self.unsaved_rows = None
+        elif self.unsaved_rows is not None:
+            self.unsaved_rows.setdefault(index, set()).update(np.unique(rows).tolist())
 
     def save_to_file(self):
-        file_name = DialogBox(self.width, self.height, "File name").run_and_return_answers(self.screen, [str])[0]
-        file = open(file_name+".txt", 'w')
-        for idx, line in enumerate(self.tiles):
-            for tile in line:
-                file.write(str(tile.get_type()))
-            file.write('\n')
-        self.running = False
+        answers = DialogBox(self.width, self.height, "File name").run_and_return_answers(self.screen, [str])
+        self.screen_dirty = True
+        if answers is None or not answers[0]:
+            return
+        self.save_path = answers[0] + ".lvl"
+        self.saver.save(self.save_path, self.layers, self.grid, self.width)
+        self.unsaved_rows = {}
+
+    def autosave(self):
+        self.saver.autosave(self.save_path or "autosave.lvl", self.layers, self.grid, self.width, self.unsaved_rows)
+        self.unsaved_rows = {}
+
+    def export_profile(self, path="profile"):
+        self.profiler.export_csv(path + ".csv")
+        self.profiler.export_json(path + ".json")
+
+    def load_from_file(self, path):
+        level = load_level(path, legacy_palette=self.types)
+        if level.grid is None:
+            level.grid = round(level.tiles.shape[1] * self.height / self.width)
+        self.grid = level.grid
+        if self.atlas.sources is None or len(self.atlas.palette) != len(level.palette):
+            self.atlas = TileAtlas(level.palette)
+        self.saver.solid = self.atlas.solid
+        self.types = level.palette
+        self.selected_type = 0
+        self.setup_grid(level.layers)
+        self.save_path = path if path.endswith('.lvl') else None
+
+    def ask_and_load(self):
+        answers = DialogBox(self.width, self.height, "File name").run_and_return_answers(self.screen, [str])
+        self.screen_dirty = True
+        if answers is None or not answers[0]:
+            return
+        self.drawn_status = None
+        try:
+            self.load_from_file(answers[0])
+            self.message = ""
+        except (OSError, ValueError) as error:
+            self.message = "Load failed: " + str(error)
 
     def handle_events(self):
-        for event in pg.event.get():
+        events = pg.event.get()
+        for event in events:
             if event.type == pg.QUIT:
                 self.running = False
             elif event.type == pg.KEYDOWN:
                 self.handle_scroll(event)
                 if event.key == pg.K_r:
                     self.erase_all()
+                self.select_tool(event.key)
+                if event.key == pg.K_z and event.mod & pg.KMOD_CTRL:
+                    self.undo()
+                if event.key == pg.K_y and event.mod & pg.KMOD_CTRL:
+                    self.redo()
                 if event.key == pg.K_RETURN:
                     self.save_to_file()
+                if event.key == pg.K_l:
+                    self.ask_and_load()
+                if event.key == pg.K_F3:
+                    self.show_profile = not self.show_profile
+                    self.profile_rect = None
+                    self.screen_dirty = True
+                if event.key == pg.K_F4:
+                    self.export_profile()
+                if pg.K_1 <= event.key <= pg.K_9:
+                    self.select_layer(event.key - pg.K_1)
+                if event.key == pg.K_n:
+                    self.add_layer()
+                if event.key == pg.K_h:
+                    self.toggle_layer()
+                if event.key in (pg.K_LEFTBRACKET, pg.K_RIGHTBRACKET):
+                    self.change_opacity(32 if event.key == pg.K_RIGHTBRACKET else -32)
+                if event.key == pg.K_m:
+                    self.toggle_minimap()
+                if event.key == pg.K_d:
+                    self.compare_with_file()
+                if event.key == pg.K_j:
+                    self.jump_to_change()
+                if event.key in (pg.K_PAGEUP, pg.K_PAGEDOWN):
+                    self.set_menu_page(self.menu_page + (1 if event.key == pg.K_PAGEDOWN else -1))
             elif event.type == pg.KEYUP:
                 self.handle_scroll(event)
+            if event.type == pg.MOUSEWHEEL:
+                if pg.mouse.get_pos()[1] >= self.camera.view_height:
+                    self.set_menu_page(self.menu_page - event.y)
+                else:
+                    self.zoom_at(pg.mouse.get_pos(), event.y)
             if event.type == pg.MOUSEMOTION:
                 self.handle_mouse_motion(event)
             if event.type == pg.MOUSEBUTTONDOWN:
                 self.handle_mouse_click(event)
             if event.type == pg.MOUSEBUTTONUP:
-                self.handle_mouse_up()
-
-    def draw_grid(self):
-        for line in self.tiles[self.on_screen[0]: self.on_screen[1]]:
-            for tile in line:
-                tile.draw(self.screen)
+                self.handle_mouse_up(event)
+            if event.type == AUTOSAVE_EVENT:
+                self.autosave()
+        self.apply_stroke()
+        return len(events) > 0
 
     def draw_tile_menu(self):
-        for tile in self.sample_tiles:
-            tile.draw(self.screen)
+        left = self.menu_x(0) - self.square_side / 2
+        rect = pg.Rect(left, self.camera.view_height, self.width - left, self.height - self.camera.view_height)
+        self.screen.fill((200, 200, 200), rect)
+        variants = {name: self.atlas.images(self.square_side, name) for name in ('normal', 'selected', 'hover')}
+        self.screen.blits([(variants['selected' if type_num == self.selected_type else
+                                     'hover' if type_num == self.hover_type else 'normal'][type_num], slot)
+                           for type_num, slot in self.menu_slots], doreturn=False)
+        self.menu_dirty = False
+        return rect
 
     def draw(self):
-        self.screen.fill((200, 200, 200))
-        self.draw_grid()
-        self.draw_tile_menu()
-        pg.display.flip()
+        if self.screen_dirty:
+            self.screen.fill((200, 200, 200))
+            self.renderer.invalidate()
+            self.mip_renderer.drawn_state = None
+        if self.zoom:
+            rects = self.mip_renderer.draw(self.screen, self.camera, self.zoom)
+        else:
+            rects = self.renderer.draw(self.screen, self.camera)
+        if self.changes is not None and rects:
+            self.draw_changes(rects)
+        if self.show_minimap:
+            covered = any(self.minimap.rect.colliderect(rect) for rect in rects)
+            minimap_rect = self.minimap.draw(self.screen, self.camera, self.zoom, covered)
+            if minimap_rect is not None:
+                rects.append(minimap_rect)
+        status_rect = self.draw_status()
+        if status_rect is not None:
+            rects.append(status_rect)
+        selection_rect = self.draw_selection()
+        if selection_rect is not None:
+            rects.append(selection_rect)
+        if self.show_profile and (rects or self.screen_dirty or self.profiler.frame_count % 15 == 0):
+            rects.append(self.draw_profile())
+        if self.menu_dirty and not self.screen_dirty:
+            rects.append(self.draw_tile_menu())
+        if self.screen_dirty:
+            self.draw_tile_menu()
+            pg.display.flip()
+            self.screen_dirty = False
+        elif rects:
+            pg.display.update(rects)
+
+    def draw_selection(self):
+        if self.selection is None and self.selection_rect is None:
+            return None
+        dirty_rect = self.selection_rect
+        if dirty_rect is not None:
+            self.repaint_view([dirty_rect.inflate(2, 2)])
+        self.selection_rect = None
+        if self.selection is not None:
+            (top, bottom), (left, right) = (sorted(pair) for pair in zip(*self.selection))
+            rect = pg.Rect(left * self.square_side, self.camera.to_screen_y(top * self.square_side),
+                           (right - left + 1) * self.square_side, (bottom - top + 1) * self.square_side)
+            self.screen.set_clip((0, 0, self.width, self.camera.view_height))
+            pg.draw.rect(self.screen, (0, 0, 0), rect, 3)
+            self.screen.set_clip(None)
+            self.selection_rect = rect
+            dirty_rect = rect if dirty_rect is None else rect.union(dirty_rect)
+        return dirty_rect.inflate(2, 2).clip((0, 0, self.width, self.camera.view_height))
+
+    def repaint_view(self, rects):
+        if self.zoom:
+            self.mip_renderer.drawn_state = None
+            self.mip_renderer.draw(self.screen, self.camera, self.zoom, pg.Rect(rects[0]).unionall(rects[1:]))
+        else:
+            self.renderer.repaint(self.screen, self.camera, rects)
+        if self.changes is not None:
+            self.draw_changes(rects)
+
+    def draw_changes(self, rects):
+        self.changes.refresh()
+        scale = self.square_side / 2 ** self.zoom
+        first = self.camera.y / self.square_side
+        rows, cols = self.changes.cells_between(int(first), int(math.ceil(first + self.camera.view_height / scale)))
+        self.screen.set_clip(pg.Rect(rects[0]).unionall(rects[1:]).clip((0, 0, self.width, self.camera.view_height)))
+        if self.zoom:
+            for y in np.unique(((rows - first) * scale).astype(np.int64)).tolist():
+                self.screen.fill((255, 200, 0), (0, y, 8, max(int(scale), 2)))
+        else:
+            for row, col in zip(rows.tolist(), cols.tolist()):
+                pg.draw.rect(self.screen, (255, 200, 0), (col * scale, (row - first) * scale, scale, scale), 2)
+        self.screen.set_clip(None)
+
+    def draw_profile(self):
+        if self.profile_rect is not None:
+            self.repaint_view([self.profile_rect])
+        right = self.width - 5 - (MINIMAP_WIDTH if self.show_minimap else 0)
+        rect = self.profiler.draw_overlay(self.screen, self.status_font, (right, 5))
+        dirty_rect = rect if self.profile_rect is None else rect.union(self.profile_rect)
+        self.profile_rect = rect
+        return dirty_rect
+
+    def draw_status(self):
+        layer = self.layers[self.active_layer]
+        status = "Layer " + str(self.active_layer + 1) + ": " + layer.name
+        if not layer.visible:
+            status += " (hidden)"
+        elif layer.opacity != 255:
+            status += " (" + str(round(layer.opacity * 100 / 255)) + "%)"
+        if self.changes is not None:
+            status += "  " + str(self.changes.count()) + " changes"
+        if self.message:
+            status += "  " + self.message
+        status += "  " + self.saver.status
+        if self.saver.busy() and self.saver.progress < 1:
+            status += " " + str(int(self.saver.progress * 100)) + "%"
+        if status == self.drawn_status and not self.screen_dirty:
+            return None
+        self.drawn_status = status
+        rect = pg.Rect(0, self.camera.view_height, self.menu_x(0) - self.square_side / 2,
+                       self.height - self.camera.view_height)
+        self.screen.fill((200, 200, 200), rect)
+        text = self.status_font.render(status, True, (0, 0, 0))
+        self.screen.blit(text, (rect.x + 5, rect.centery - text.get_height() / 2), (0, 0, rect.width - 5, rect.height))
+        return rect
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Tile map editor")
+    parser.add_argument('level', nargs='?', help="level file to open")
+    parser.add_argument('--atlas', help="tileset descriptor json used to draw and name tile types")
+    args = parser.parse_args()
     pg.init()
-    TileEditor().run()
+    TileEditor(atlas_path=args.atlas).run(args.level)
     pg.quit()
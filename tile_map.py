@@ -0,0 +1,253 @@
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class TileMap:
+
+    def __init__(self, cols, palette, rows=0, chunk_rows=256, memory_budget=64 * 1024 * 1024, scratch_dir=None):
+        self.cols = cols
+        self.palette = palette
+        self.dtype = np.uint8 if len(palette) <= 256 else np.uint16
+        self.rows = 0
+        self.listeners = []
+        self.chunk_rows = chunk_rows
+        self.chunk_bytes = max(chunk_rows * cols * np.dtype(self.dtype).itemsize, 1)
+        self.memory_budget = memory_budget
+        self.max_resident = max(2, memory_budget // self.chunk_bytes)
+        self.scratch_dir = scratch_dir
+        self.resident = OrderedDict()
+        self.paged = {}
+        self.base = None
+        self.scratch = None
+        self.scratch_end = 0
+        self.free_slots = []
+        self.pending_slots = []
+        self.shared = set()
+        self.snapshots = 0
+        self.parent = None
+        self.lock = threading.Lock()
+        self.empty = np.zeros((chunk_rows, cols), dtype=self.dtype)
+        self.empty.flags.writeable = False
+        self.add_rows(rows)
+
+    @classmethod
+    def from_array(cls, array, palette, **kwargs):
+        tile_map = cls(array.shape[1], palette, **kwargs)
+        tile_map.base = np.asarray(array, dtype=tile_map.dtype)
+        tile_map.rows = array.shape[0]
+        return tile_map
+
+    def add_rows(self, count=1):
+        self.rows += count
+
+    def chunk_count(self):
+        return -(-self.rows // self.chunk_rows)
+
+    def in_base(self, chunk):
+        return self.base is not None and chunk * self.chunk_rows < self.base.shape[0]
+
+    def stored(self, chunk):
+        return chunk in self.resident or chunk in self.paged or self.in_base(chunk)
+
+    def read_base(self, chunk):
+        start = chunk * self.chunk_rows
+        block = self.base[start:start + self.chunk_rows]
+        if len(block) == self.chunk_rows:
+            return block
+        padded = np.zeros((self.chunk_rows, self.cols), dtype=self.dtype)
+        padded[:len(block)] = block
+        return padded
+
+    def write_scratch(self, array):
+        if self.scratch is None:
+            self.scratch = tempfile.TemporaryFile(dir=self.scratch_dir)
+        if self.free_slots:
+            slot = self.free_slots.pop()
+        else:
+            slot = self.scratch_end
+            self.scratch_end += self.chunk_bytes
+        os.pwrite(self.scratch.fileno(), array.tobytes(), slot)
+        return slot
+
+    def read_scratch(self, slot):
+        array = np.empty((self.chunk_rows, self.cols), dtype=self.dtype)
+        os.preadv(self.scratch.fileno(), [array], slot)
+        return array
+
+    def free_slot(self, slot):
+        (self.pending_slots if self.snapshots else self.free_slots).append(slot)
+
+    def evict(self):
+        while len(self.resident) > self.max_resident:
+            chunk, array = self.resident.popitem(last=False)
+            self.shared.discard(chunk)
+            if array.any() or self.in_base(chunk):
+                self.paged[chunk] = self.write_scratch(array)
+
+    def chunk(self, chunk, write=False, cache=True):
+        with self.lock:
+            array = self.resident.get(chunk)
+            if array is not None:
+                if self.parent is None:
+                    self.resident.move_to_end(chunk)
+                if write and chunk in self.shared:
+                    array = self.resident[chunk] = array.copy()
+                    self.shared.discard(chunk)
+                return array
+            if chunk in self.paged:
+                array = self.read_scratch(self.paged[chunk])
+                if self.parent is not None or not (write or cache):
+                    return array
+                self.free_slot(self.paged.pop(chunk))
+            elif self.in_base(chunk):
+                array = self.read_base(chunk)
+                if not write:
+                    return array
+                if array.base is not None:
+                    array = array.copy()
+            elif write:
+                array = np.zeros((self.chunk_rows, self.cols), dtype=self.dtype)
+            else:
+                return self.empty
+            self.resident[chunk] = array
+            self.evict()
+            return array
+
+    def iter_chunks(self, skip_empty=False):
+        for chunk in range(self.chunk_count()):
+            if skip_empty and not self.stored(chunk):
+                continue
+            start = chunk * self.chunk_rows
+            yield start, self.chunk(chunk, cache=False)[:min(self.chunk_rows, self.rows - start)]
+
+    def group_by_chunk(self, rows):
+        chunks = rows // self.chunk_rows
+        if chunks.size and chunks[0] == chunks[-1] and (chunks == chunks[0]).all():
+            yield int(chunks[0]), slice(None)
+            return
+        order = np.argsort(chunks, kind='stable')
+        for group in np.split(order, np.flatnonzero(np.diff(chunks[order])) + 1):
+            if group.size:
+                yield int(chunks[group[0]]), group
+
+    def get(self, row, col):
+        return int(self.chunk(row // self.chunk_rows)[row % self.chunk_rows, col])
+
+    def get_rows(self, start, stop, cache=True):
+        start, stop = max(start, 0), min(stop, self.rows)
+        if start >= stop:
+            return np.zeros((0, self.cols), dtype=self.dtype)
+        first, last = start // self.chunk_rows, (stop - 1) // self.chunk_rows
+        if first == last:
+            offset = first * self.chunk_rows
+            return self.chunk(first, cache=cache)[start - offset:stop - offset]
+        out = np.empty((stop - start, self.cols), dtype=self.dtype)
+        for chunk in range(first, last + 1):
+            offset = chunk * self.chunk_rows
+            low, high = max(start, offset), min(stop, offset + self.chunk_rows)
+            out[low - start:high - start] = self.chunk(chunk, cache=cache)[low - offset:high - offset]
+        return out
+
+    def stored_between(self, start, stop):
+        return any(self.stored(chunk) for chunk in range(max(start, 0) // self.chunk_rows,
+                                                         (min(stop, self.rows) - 1) // self.chunk_rows + 1))
+
+    def take_rows(self, rows):
+        rows = np.asarray(rows, dtype=np.int64)
+        out = np.empty((len(rows), self.cols), dtype=self.dtype)
+        for chunk, group in self.group_by_chunk(rows):
+            out[group] = self.chunk(chunk)[rows[group] - chunk * self.chunk_rows]
+        return out
+
+    def get_cells(self, rows, cols):
+        rows, cols = np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)
+        out = np.empty(len(rows), dtype=self.dtype)
+        for chunk, group in self.group_by_chunk(rows):
+            out[group] = self.chunk(chunk)[rows[group] - chunk * self.chunk_rows, cols[group]]
+        return out
+
+    def set(self, row, col, type_num):
+        self.chunk(row // self.chunk_rows, write=True)[row % self.chunk_rows, col] = type_num
+        self._notify(np.array([row]), np.array([col]))
+
+    def set_cells(self, rows, cols, type_num):
+        rows, cols = np.atleast_1d(rows).astype(np.int64), np.atleast_1d(cols).astype(np.int64)
+        values = np.broadcast_to(np.asarray(type_num, dtype=self.dtype), rows.shape)
+        for chunk, group in self.group_by_chunk(rows):
+            self.chunk(chunk, write=True)[rows[group] - chunk * self.chunk_rows, cols[group]] = values[group]
+        self._notify(rows, cols)
+
+    def fill_mask(self, top, mask, type_num):
+        stop = top + len(mask)
+        for chunk in range(top // self.chunk_rows, (stop - 1) // self.chunk_rows + 1):
+            offset = chunk * self.chunk_rows
+            low, high = max(top, offset), min(stop, offset + self.chunk_rows)
+            band = mask[low - top:high - top]
+            if band.any():
+                np.copyto(self.chunk(chunk, write=True)[low - offset:high - offset], type_num, where=band)
+        self._notify(top + np.flatnonzero(mask.any(axis=1)), None)
+
+    def fill_rows(self, start, stop, type_num):
+        for chunk in range(start // self.chunk_rows, (stop - 1) // self.chunk_rows + 1):
+            if not type_num and not self.stored(chunk):
+                continue
+            offset = chunk * self.chunk_rows
+            self.chunk(chunk, write=True)[max(start, offset) - offset:min(stop, offset + self.chunk_rows) - offset] = \
+                type_num
+        self._notify(np.arange(start, stop), None)
+
+    def clear(self, type_num=0):
+        with self.lock:
+            for slot in self.paged.values():
+                self.free_slot(slot)
+            self.resident.clear()
+            self.paged.clear()
+            self.shared.clear()
+            self.base = None
+        if type_num:
+            for chunk in range(self.chunk_count()):
+                self.chunk(chunk, write=True)[:self.rows - chunk * self.chunk_rows] = type_num
+        self._notify(None, None)
+
+    def snapshot(self):
+        with self.lock:
+            snapshot = TileMap(self.cols, self.palette, self.rows, self.chunk_rows, self.memory_budget)
+            snapshot.resident = OrderedDict(self.resident)
+            snapshot.paged = dict(self.paged)
+            snapshot.base = self.base
+            snapshot.scratch = self.scratch
+            snapshot.parent = self
+            self.shared.update(self.resident)
+            self.snapshots += 1
+        return snapshot
+
+    def release(self):
+        parent = self.parent
+        with parent.lock:
+            parent.snapshots -= 1
+            if not parent.snapshots:
+                parent.shared.clear()
+                parent.free_slots.extend(parent.pending_slots)
+                parent.pending_slots = []
+        self.resident.clear()
+        self.paged.clear()
+
+    def resident_bytes(self):
+        return len(self.resident) * self.chunk_bytes
+
+    def _notify(self, rows, cols):
+        for listener in self.listeners:
+            listener(rows, cols)
+
+    def color(self, type_num, selected=False):
+        return self.palette[type_num][1 if selected else 0]
+
+    def to_array(self):
+        out = np.zeros((self.rows, self.cols), dtype=self.dtype)
+        for start, block in self.iter_chunks(skip_empty=True):
+            out[start:start + len(block)] = block
+        return out